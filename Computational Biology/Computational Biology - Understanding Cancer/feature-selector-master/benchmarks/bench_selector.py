@@ -0,0 +1,245 @@
+"""
+Scaling benchmark for the `FeatureSelector` methods on synthetic wide data.
+
+For every combination of rows x columns x categorical fraction in the grid a synthetic dataset is
+generated (with missing, single unique, collinear and irrelevant features) and each method is timed:
+`identify_missing`, `identify_single_unique`, `identify_collinear`, `identify_zero_importance` and `remove`.
+Wall time and peak traced memory (allocations made through Python and NumPy, as seen by tracemalloc)
+are saved to a JSON file together with the commit and library versions. Tracing slows allocations down,
+so the times come from a run with tracing off and the peaks from a separate traced run.
+
+Passing `--compare` with the results of another commit reports every measurement that got slower
+(or used more memory) than `--tolerance` times the previous value and exits with status 1.
+
+Usage:
+
+    python benchmarks/bench_selector.py --output results.json
+    python benchmarks/bench_selector.py --quick --output new.json --compare results.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from feature_selector import FeatureSelector
+
+METHODS = ['identify_missing', 'identify_single_unique', 'identify_collinear', 'identify_zero_importance', 'remove']
+
+# (rows, columns, categorical fraction)
+GRID = {'rows': [1000, 10000, 50000],
+        'columns': [50, 200, 1000],
+        'categorical_fraction': [0.0, 0.2]}
+
+QUICK_GRID = {'rows': [1000, 5000],
+              'columns': [20, 100],
+              'categorical_fraction': [0.0, 0.2]}
+
+
+def make_dataset(n_rows, n_features, categorical_fraction, seed=50):
+    """
+    Synthetic dataset with `n_features` features and binary labels.
+
+    A fraction `categorical_fraction` of the features are string categoricals with up to 20 categories.
+    Of the numeric features, 10% have 70% missing values, 5% are constant and half are noisy copies of
+    a shared factor (so they are collinear). The labels depend on the first few numeric features.
+    """
+
+    rng = np.random.RandomState(seed)
+
+    n_categorical = int(round(n_features * categorical_fraction))
+    n_numeric = n_features - n_categorical
+
+    # Groups of 5 columns share a factor, the rest is independent noise
+    n_groups = max(1, n_numeric // 10)
+    factors = rng.randn(n_rows, n_groups)
+    numeric = rng.randn(n_rows, n_numeric)
+    n_collinear = min(n_numeric, 5 * n_groups)
+    numeric[:, :n_collinear] = (factors[:, np.arange(n_collinear) // 5] +
+                                0.05 * rng.randn(n_rows, n_collinear))
+
+    # Missing and constant features at the end of the numeric block
+    n_missing = n_numeric // 10
+    n_constant = n_numeric // 20
+    for i in range(n_missing):
+        numeric[rng.rand(n_rows) < 0.7, n_numeric - 1 - i] = np.nan
+    numeric[:, n_numeric - n_missing - n_constant:n_numeric - n_missing] = 1.0
+
+    data = pd.DataFrame(numeric, columns = ['numeric_%d' % i for i in range(n_numeric)])
+
+    for i in range(n_categorical):
+        n_categories = rng.randint(2, 21)
+        data['categorical_%d' % i] = np.array(['level_%d' % c for c in range(n_categories)])[rng.randint(n_categories, size = n_rows)]
+
+    logit = numeric[:, :min(3, n_numeric)].sum(axis = 1) if n_numeric else rng.randn(n_rows)
+    labels = (logit + rng.randn(n_rows) > 0).astype(int)
+
+    return data, labels
+
+
+def measure_time(func):
+    """Run `func()` and return the wall time in seconds"""
+
+    start = time.perf_counter()
+
+    func()
+
+    return time.perf_counter() - start
+
+
+def measure_peak(func):
+    """Run `func()` with tracemalloc on and return the peak traced memory in MB"""
+
+    tracemalloc.start()
+
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak / 1e6
+
+
+def selector_steps(fs, n_iterations):
+    """The benchmarked methods of `fs` in the order they are run"""
+
+    return [('identify_missing', lambda: fs.identify_missing(0.6)),
+            ('identify_single_unique', lambda: fs.identify_single_unique()),
+            ('identify_collinear', lambda: fs.identify_collinear(0.95)),
+            ('identify_zero_importance', lambda: fs.identify_zero_importance('classification', 'auc',
+                                                                             n_iterations = n_iterations,
+                                                                             random_state = 50)),
+            ('remove', lambda: fs.remove('all'))]
+
+
+def run_case(n_rows, n_features, categorical_fraction, n_iterations, repeat):
+    """Time every method on one synthetic dataset, keeping the best of `repeat` runs"""
+
+    data, labels = make_dataset(n_rows, n_features, categorical_fraction)
+
+    seconds = {method: np.inf for method in METHODS}
+    peak_mb = {method: np.inf for method in METHODS}
+
+    for _ in range(repeat):
+        # Timed run with tracing off, then a separate traced run on a new selector for the peaks
+        fs = FeatureSelector(data, labels)
+        for method, step in selector_steps(fs, n_iterations):
+            seconds[method] = min(seconds[method], measure_time(step))
+
+        fs = FeatureSelector(data, labels)
+        for method, step in selector_steps(fs, n_iterations):
+            peak_mb[method] = min(peak_mb[method], measure_peak(step))
+
+    return [{'rows': n_rows, 'columns': n_features, 'categorical_fraction': categorical_fraction,
+             'method': method, 'seconds': seconds[method], 'peak_mb': peak_mb[method]} for method in METHODS]
+
+
+def environment():
+    """Commit and library versions the results were produced with"""
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = os.path.dirname(os.path.abspath(__file__)),
+                                         stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import lightgbm
+    import sklearn
+
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'lightgbm': lightgbm.__version__, 'scikit-learn': sklearn.__version__}
+
+
+def compare(results, baseline, tolerance):
+    """Measurements in `results` worse than `tolerance` times the matching measurement in `baseline`"""
+
+    key = lambda r: (r['rows'], r['columns'], r['categorical_fraction'], r['method'])
+    previous = {key(r): r for r in baseline['results']}
+
+    regressions = []
+    for result in results:
+        if key(result) not in previous:
+            continue
+
+        for metric in ['seconds', 'peak_mb']:
+            old, new = previous[key(result)][metric], result[metric]
+
+            # Ignore differences too small to measure reliably
+            floor = 0.01 if metric == 'seconds' else 1.0
+            if new > tolerance * max(old, floor):
+                regressions.append((key(result), metric, old, new))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.strip().split('\n')[0])
+    parser.add_argument('--output', default = 'bench_selector.json', help = 'JSON file for the results')
+    parser.add_argument('--quick', action = 'store_true', help = 'Use a small grid')
+    parser.add_argument('--rows', type = int, nargs = '+', help = 'Override the grid rows')
+    parser.add_argument('--columns', type = int, nargs = '+', help = 'Override the grid columns')
+    parser.add_argument('--categorical_fraction', type = float, nargs = '+', help = 'Override the grid categorical fractions')
+    parser.add_argument('--n_iterations', type = int, default = 2, help = 'gbm iterations for identify_zero_importance')
+    parser.add_argument('--repeat', type = int, default = 1)
+    parser.add_argument('--compare', help = 'JSON results of another commit to check for regressions')
+    parser.add_argument('--tolerance', type = float, default = 1.5, help = 'Allowed slowdown factor when comparing')
+    args = parser.parse_args()
+
+    grid = dict(QUICK_GRID if args.quick else GRID)
+    for name in grid:
+        if getattr(args, name) is not None:
+            grid[name] = getattr(args, name)
+
+    results = []
+    for n_rows, n_features, categorical_fraction in itertools.product(grid['rows'], grid['columns'],
+                                                                      grid['categorical_fraction']):
+
+        # The selector prints progress, keep the benchmark output readable
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                case = run_case(n_rows, n_features, categorical_fraction, args.n_iterations, args.repeat)
+            finally:
+                sys.stdout = stdout
+
+        for result in case:
+            print('%7d rows %5d cols %4.2f cat  %-25s %9.3f s %9.1f MB' % (n_rows, n_features, categorical_fraction,
+                                                                          result['method'], result['seconds'],
+                                                                          result['peak_mb']))
+        results.extend(case)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'grid': grid, 'results': results}, f, indent = 2)
+
+    print('Saved %d measurements to %s' % (len(results), args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+
+        for (n_rows, n_features, categorical_fraction, method), metric, old, new in regressions:
+            print('REGRESSION %s %s (%d rows, %d cols, %0.2f cat): %0.3f -> %0.3f' % (method, metric, n_rows, n_features,
+                                                                                  categorical_fraction, old, new))
+
+        if regressions:
+            sys.exit(1)
+
+        print('No regressions against %s' % baseline['environment'].get('commit'))
+
+
+if __name__ == '__main__':
+    main()
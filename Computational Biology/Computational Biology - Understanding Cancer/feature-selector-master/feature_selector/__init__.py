@@ -1 +1,3 @@
 from .feature_selector import FeatureSelector
+from .streaming import StreamingStats, HyperLogLog
+from .projection import FeatureProjection
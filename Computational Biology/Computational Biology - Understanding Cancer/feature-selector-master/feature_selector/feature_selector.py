@@ -2,6 +2,13 @@
 import pandas as pd
 import numpy as np
 
+# sparse storage for one-hot encoded features
+from scipy import sparse
+
+# hierarchical ordering of large correlation heatmaps
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import squareform
+
 # model used for feature importances
 import lightgbm as lgb
 
@@ -12,12 +19,202 @@ from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# memory management
-import gc
+# single pass statistics for datasets larger than memory
+from .streaming import StreamingStats, _corr_from_moments
+
+# lazy removal of features
+from .projection import FeatureProjection
+
+# parallel importance runs
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+# memoized statistics
+import hashlib
+import pickle
 
 # utilities
 from itertools import chain
 
+
+def _fit_importances(dataset, params, early_stopping, seed, lock):
+    """
+    Train one gradient boosting machine on a constructed `lgb.Dataset` and return its feature importances.
+
+    The validation split is taken by row index from the already binned `dataset`, so the
+    features are never re-binned or copied as raw values. `seed` controls both the split
+    and the model. `lock` serializes subset construction when called from several threads.
+    """
+
+    if seed is not None:
+        params = dict(params, seed = seed)
+
+    # If training using early stopping need a validation set
+    if early_stopping:
+
+        train_idx, valid_idx = train_test_split(np.arange(dataset.num_data()), test_size = 0.15,
+                                                random_state = seed)
+
+        # Subsets share the bin boundaries of `dataset`
+        with lock:
+            train_set = dataset.subset(np.sort(train_idx)).construct()
+            valid_set = dataset.subset(np.sort(valid_idx)).construct()
+
+        # Train the model with early stopping
+        booster = lgb.train(params, train_set, num_boost_round = 1000, valid_sets = [valid_set],
+                            callbacks = [lgb.early_stopping(100, verbose = False)])
+
+    else:
+        booster = lgb.train(params, dataset, num_boost_round = 1000)
+
+    return booster.feature_importance()
+
+
+def _construct_dataset(features, labels, offset, categorical_features):
+    """
+    Bin `features` into a constructed `lgb.Dataset`.
+
+    Features get positional names starting at `f<offset>` because LightGBM rejects some
+    characters in column names.
+    """
+
+    return lgb.Dataset(features, label = labels, params = {'verbose': -1},
+                       feature_name = ['f%d' % i for i in range(offset, offset + features.shape[1])],
+                       categorical_feature = categorical_features).construct()
+
+
+def _one_hot_sparse(data, categorical_features):
+    """
+    One-hot encode `categorical_features` of `data` into a sparse matrix.
+
+    Columns are named and ordered as by `pd.get_dummies` (`<feature>_<category>`, categories sorted)
+    and missing values are encoded as all zeros.
+
+    Returns
+    --------
+        matrix : scipy.sparse.csc_matrix of uint8 with one column per category
+        columns : pd.Index of the one-hot column names
+    """
+
+    blocks = []
+    columns = []
+
+    for feature in categorical_features:
+        categorical = pd.Categorical(data[feature])
+        codes = categorical.codes
+
+        # Rows with a category (code -1 is missing)
+        rows = np.flatnonzero(codes >= 0)
+        blocks.append(sparse.csc_matrix((np.ones(len(rows), dtype = np.uint8), (rows, codes[rows])),
+                                        shape = (data.shape[0], len(categorical.categories))))
+
+        columns.extend('%s_%s' % (feature, category) for category in categorical.categories)
+
+    if blocks:
+        matrix = sparse.hstack(blocks, format = 'csc')
+    else:
+        matrix = sparse.csc_matrix((data.shape[0], 0), dtype = np.uint8)
+
+    return matrix, pd.Index(columns)
+
+
+def _one_hot_corr(numeric, one_hot):
+    """
+    Correlation matrix of the numeric features in the dataframe `numeric` together with the
+    sparse one-hot features `one_hot`, without building a dense copy of the one-hot columns.
+    """
+
+    # Center the numeric features to limit cancellation in the moment formulas
+    values = numeric.values.astype(np.float64)
+    present = ~np.isnan(values)
+    values = np.where(present, values - np.nanmean(values, axis = 0), 0.0)
+    present = present.astype(np.float64)
+
+    dummies = one_hot.astype(np.float64)
+
+    n_rows = values.shape[0]
+    n_numeric = values.shape[1]
+    n_total = n_numeric + dummies.shape[1]
+
+    n = np.empty((n_total, n_total))
+    sum_x = np.empty((n_total, n_total))
+    sum_xx = np.empty((n_total, n_total))
+    sum_xy = np.empty((n_total, n_total))
+
+    num = slice(0, n_numeric)
+    hot = slice(n_numeric, n_total)
+
+    # Numeric with numeric (pairwise-complete)
+    n[num, num] = present.T @ present
+    sum_x[num, num] = values.T @ present
+    sum_xx[num, num] = (values ** 2).T @ present
+    sum_xy[num, num] = values.T @ values
+
+    # One-hot features are never missing, so pairs with a numeric feature use its present rows
+    dummies_present = np.asarray((dummies.T @ present))
+    dummies_count = np.asarray(dummies.sum(axis = 0)).ravel()
+
+    n[num, hot] = present.sum(axis = 0)[:, np.newaxis]
+    n[hot, num] = n[num, hot].T
+    sum_x[num, hot] = values.sum(axis = 0)[:, np.newaxis]
+    sum_x[hot, num] = dummies_present
+    sum_xx[num, hot] = (values ** 2).sum(axis = 0)[:, np.newaxis]
+    sum_xx[hot, num] = dummies_present
+    sum_xy[num, hot] = np.asarray(dummies.T @ values).T
+    sum_xy[hot, num] = sum_xy[num, hot].T
+
+    # One-hot with one-hot (values are 0/1, so squares equal the values)
+    n[hot, hot] = n_rows
+    sum_x[hot, hot] = dummies_count[:, np.newaxis]
+    sum_xx[hot, hot] = dummies_count[:, np.newaxis]
+    sum_xy[hot, hot] = (dummies.T @ dummies).toarray()
+
+    return _corr_from_moments(n, sum_x, sum_xx, sum_xy)
+
+
+def _cluster_order(corr):
+    """
+    Order of the features of the square correlation array `corr` from average linkage hierarchical
+    clustering with distance 1 - |correlation|, so strongly correlated features end up next to each other.
+    """
+
+    distance = 1 - np.abs(np.nan_to_num(corr))
+    np.fill_diagonal(distance, 0)
+
+    linkage = hierarchy.linkage(squareform(np.clip(distance, 0, 1), checks = False), method = 'average')
+
+    return hierarchy.leaves_list(linkage)
+
+
+def _aggregate_blocks(values, block_size, how = 'mean'):
+    """
+    Downsample a 2D array by aggregating blocks of `block_size` (rows, columns) cells, ignoring NaNs.
+    `how` is 'mean' (average correlation) or 'max_abs' (the correlation with the largest magnitude).
+    """
+
+    rows, cols = block_size
+    n_row_blocks = int(np.ceil(values.shape[0] / rows))
+    n_col_blocks = int(np.ceil(values.shape[1] / cols))
+
+    # Pad with NaN to whole blocks
+    padded = np.full((n_row_blocks * rows, n_col_blocks * cols), np.nan)
+    padded[:values.shape[0], :values.shape[1]] = values
+    blocks = padded.reshape(n_row_blocks, rows, n_col_blocks, cols).transpose(0, 2, 1, 3).reshape(n_row_blocks, n_col_blocks, -1)
+
+    with np.errstate(invalid = 'ignore'):
+        if how == 'mean':
+            return np.nanmean(blocks, axis = 2) if blocks.size else blocks.sum(axis = 2)
+
+        elif how == 'max_abs':
+            magnitude = np.where(np.isnan(blocks), -1, np.abs(blocks))
+            idx = magnitude.argmax(axis = 2)[..., np.newaxis]
+            return np.take_along_axis(blocks, idx, axis = 2)[..., 0]
+
+    raise ValueError('how must be either "mean" or "max_abs"')
+
+
 class FeatureSelector():
     """
     Class for performing feature selection for machine learning or data preprocessing.
@@ -39,6 +236,18 @@ class FeatureSelector():
             Array of labels for training the machine learning model to find feature importances. These can be either binary labels
             (if task is 'classification') or continuous targets (if task is 'regression').
             If no labels are provided, then the feature importance based methods are not available.
+
+        stats : StreamingStats, default = None
+            Statistics accumulated over a dataset in chunks, used instead of `data` (which is then None).
+            Use `FeatureSelector.from_file` to create a selector for a file larger than memory.
+
+        cache : boolean, default = False
+            Whether to memoize the missing fractions, unique counts, correlation matrix and feature importances.
+            Re-running a method with a different threshold then only re-filters the cached statistics.
+
+        cache_dir : string, default = None
+            Directory where the memoized statistics are also pickled, so parameter sweeps can resume
+            across sessions. Implies `cache = True`.
         
     Attributes
     --------
@@ -78,21 +287,40 @@ class FeatureSelector():
     --------
     
         - All 5 operations can be run with the `identify_all` method.
-        - If using feature importances, one-hot encoding is used for categorical variables which creates new columns
+        - If using one-hot encoding (`one_hot = True` in `identify_collinear` or `identify_zero_importance`),
+          the categorical variables are expanded into new columns. The encoding is computed once, kept
+          as a sparse matrix and shared by all methods (see `one_hot_encoding`).
+        - Cached statistics are keyed on a fingerprint of the data (and labels) and on the settings that
+          affect them. The data is fingerprinted once, so it should not be modified in place after creating the selector.
+          Feature importances are cached even without a `random_state`, so repeated runs return the same importances.
+        - In streaming mode (created with `from_file`) only `identify_missing`, `identify_single_unique`
+          and `identify_collinear` (without one-hot encoding) are available. The number of unique values
+          is estimated with HyperLogLog sketches; single unique features are still found exactly.
     
     """
     
-    def __init__(self, data, labels=None):
+    def __init__(self, data, labels=None, stats=None, cache=False, cache_dir=None):
+
+        if data is None and stats is None:
+            raise ValueError('Either data or streaming statistics must be provided.')
         
         # Dataset and optional training labels
         self.data = data
         self.labels = labels
 
+        # Statistics of a dataset read in chunks and the file they were read from
+        self.stats = stats
+        self.source = None
+
         if labels is None:
             print('No labels provided. Feature importance based methods are not available.')
         
-        self.base_features = list(data.columns)
+        self.base_features = list(data.columns) if data is not None else list(stats.columns)
         self.one_hot_features = None
+
+        # Sparse one-hot encoding, computed on first use
+        self._one_hot = None
+        self._data_all = None
         
         # Dataframes recording information about features to remove
         self.record_missing = None
@@ -105,11 +333,173 @@ class FeatureSelector():
         self.unique_stats = None
         self.corr_matrix = None
         self.feature_importances = None
+
+        # Feature order and blocks of the last correlation overview
+        self.corr_order = None
+        self.corr_blocks = None
         
         # Dictionary to hold removal operations
         self.ops = {}
         
         self.one_hot_correlated = False
+        self.one_hot_importance = False
+
+        # Memoized statistics (in memory and optionally on disk)
+        self.cache_dir = cache_dir
+        self._cache = {} if (cache or cache_dir is not None) else None
+        self._fingerprint = None
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok = True)
+
+    @classmethod
+    def from_file(cls, path, chunksize=100000, hll_precision=12, cache=False, cache_dir=None):
+        """
+        Create a selector in streaming mode for a CSV or Parquet file that may not fit in memory.
+        The file is read once in chunks of `chunksize` rows to accumulate the statistics.
+
+        Parameters
+        --------
+            path : string
+                CSV file, or Parquet file if the extension is `.parquet` or `.pq`
+
+            chunksize : int, default = 100000
+                Number of rows held in memory at a time
+
+            hll_precision : int, default = 12
+                Precision of the HyperLogLog sketches used to count unique values
+
+            cache, cache_dir
+                See `FeatureSelector`. The file is fingerprinted by its path, size and modification time.
+        """
+
+        selector = cls(None, stats = StreamingStats.from_file(path, chunksize = chunksize, hll_precision = hll_precision),
+                       cache = cache, cache_dir = cache_dir)
+        selector.source = path
+
+        return selector
+
+    @property
+    def fingerprint(self):
+        """Hash identifying the dataset, used to key the cached statistics"""
+
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+
+            if self.streaming:
+                # A file is identified by its location, size and modification time
+                info = os.stat(self.source)
+                digest.update(repr((os.path.abspath(self.source), info.st_size, info.st_mtime_ns)).encode())
+
+            else:
+                digest.update(repr((self.data.shape, list(self.data.columns), [str(dtype) for dtype in self.data.dtypes])).encode())
+                digest.update(pd.util.hash_pandas_object(self.data, index = True).values.tobytes())
+
+            self._fingerprint = digest.hexdigest()
+
+        return self._fingerprint
+
+    def _labels_fingerprint(self):
+        """Hash of the training labels"""
+
+        labels = pd.Series(np.array(self.labels).reshape((-1, )))
+        return hashlib.sha1(pd.util.hash_pandas_object(labels, index = False).values.tobytes()).hexdigest()
+
+    def _cached(self, name, settings, compute):
+        """
+        Return the statistic `name` computed with `settings` for this dataset, calling `compute()` only
+        if it is not already in the memory or disk cache. Without caching this just calls `compute()`.
+        """
+
+        if self._cache is None:
+            return compute()
+
+        key = '%s_%s' % (name, hashlib.sha1(repr((self.fingerprint, settings)).encode()).hexdigest())
+
+        if key not in self._cache:
+            path = None if self.cache_dir is None else os.path.join(self.cache_dir, key + '.pkl')
+
+            if path is not None and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self._cache[key] = pickle.load(f)
+
+            else:
+                self._cache[key] = compute()
+
+                if path is not None:
+                    # Write then rename so an interrupted run never leaves a partial file
+                    with open(path + '.tmp', 'wb') as f:
+                        pickle.dump(self._cache[key], f, protocol = pickle.HIGHEST_PROTOCOL)
+                    os.replace(path + '.tmp', path)
+
+        return self._cache[key]
+
+    @property
+    def streaming(self):
+        """Whether the selector works from streaming statistics rather than an in-memory dataframe"""
+        return self.data is None
+
+    @property
+    def categorical_features(self):
+        """Features that are expanded by one-hot encoding (same columns as `pd.get_dummies`)"""
+        return list(self.data.select_dtypes(include = ['object', 'category']).columns)
+
+    def one_hot_encoding(self):
+        """
+        Sparse one-hot encoding of the categorical features. Computed on the first call and cached.
+
+        Returns
+        --------
+            matrix : scipy.sparse.csc_matrix of uint8 with one column per category
+            columns : pd.Index of the one-hot column names (as produced by `pd.get_dummies`)
+        """
+
+        if self.streaming:
+            raise ValueError('One-hot encoding is not available in streaming mode.')
+
+        if self._one_hot is None:
+            self._one_hot = _one_hot_sparse(self.data, self.categorical_features)
+
+            # Record the one-hot columns that are new features
+            self.one_hot_features = [column for column in self._one_hot[1] if column not in self.base_features]
+
+            # The combined frame is rebuilt from the new encoding
+            self._data_all = None
+
+        return self._one_hot
+
+    def _one_hot_subset(self, columns = None):
+        """Sparse matrix and names of (a subset of) the one-hot features"""
+
+        matrix, names = self.one_hot_encoding()
+
+        if columns is not None:
+            idx = names.get_indexer(columns)
+            matrix, names = matrix[:, idx], names[idx]
+
+        return matrix, names
+
+    def _one_hot_frame(self, columns = None):
+        """Dataframe of (a subset of) the one-hot features backed by sparse columns"""
+
+        matrix, names = self._one_hot_subset(columns)
+
+        return pd.DataFrame.sparse.from_spmatrix(matrix, index = self.data.index, columns = names)
+
+    @property
+    def data_all(self):
+        """
+        Original data with the one-hot encoded features (as sparse columns) added in front.
+        Built on the first access after one-hot encoding and cached, as it copies the whole dataset.
+        """
+
+        if self.one_hot_features is None:
+            return self.data
+
+        if self._data_all is None:
+            self._data_all = pd.concat([self._one_hot_frame(self.one_hot_features), self.data], axis = 1)
+
+        return self._data_all
         
     def identify_missing(self, missing_threshold):
         """Find the features with a fraction of missing values above `missing_threshold`"""
@@ -117,7 +507,10 @@ class FeatureSelector():
         self.missing_threshold = missing_threshold
 
         # Calculate the fraction of missing in each column 
-        missing_series = self.data.isnull().sum() / self.data.shape[0]
+        if self.streaming:
+            missing_series = self._cached('missing', (), lambda: self.stats.missing_fraction)
+        else:
+            missing_series = self._cached('missing', (), lambda: self.data.isnull().sum() / self.data.shape[0])
         self.missing_stats = pd.DataFrame(missing_series).rename(columns = {'index': 'feature', 0: 'missing_fraction'})
 
         # Sort with highest number of missing values on top
@@ -139,7 +532,10 @@ class FeatureSelector():
         """Finds features with only a single unique value. NaNs do not count as a unique value. """
 
         # Calculate the unique counts in each column
-        unique_counts = self.data.nunique()
+        if self.streaming:
+            unique_counts = self._cached('nunique', (), lambda: self.stats.nunique)
+        else:
+            unique_counts = self._cached('nunique', (), lambda: self.data.nunique())
         self.unique_stats = pd.DataFrame(unique_counts).rename(columns = {'index': 'feature', 0: 'nunique'})
         self.unique_stats = self.unique_stats.sort_values('nunique', ascending = True)
         
@@ -169,65 +565,81 @@ class FeatureSelector():
             Value of the Pearson correlation cofficient for identifying correlation features
 
         one_hot : boolean, default = False
-            Whether to one-hot encode the features before calculating the correlation coefficients
+            Whether to one-hot encode the features before calculating the correlation coefficients.
+            Not available in streaming mode.
 
         """
+
+        if one_hot and self.streaming:
+            raise ValueError('One-hot encoded correlations are not available in streaming mode.')
         
         self.correlation_threshold = correlation_threshold
         self.one_hot_correlated = one_hot
         
-         # Calculate the correlations between every column
         if one_hot:
-            
-            # One hot encoding
-            features = pd.get_dummies(self.data)
-            self.one_hot_features = [column for column in features.columns if column not in self.base_features]
-
-            # Add one hot encoded data to original data
-            self.data_all = pd.concat([features[self.one_hot_features], self.data], axis = 1)
-            
-            corr_matrix = pd.get_dummies(features).corr()
+            # Records the one-hot features even if the correlations come from the cache
+            self.one_hot_encoding()
 
-        else:
-            corr_matrix = self.data.corr()
+        # Calculate the correlations between every column
+        corr_matrix = self._cached('corr', (one_hot, ), lambda: self._compute_corr(one_hot))
         
         self.corr_matrix = corr_matrix
     
-        # Extract the upper triangle of the correlation matrix
-        upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k = 1).astype(np.bool))
-        
-        # Select the features with correlations above the threshold
-        # Need to use the absolute value
-        to_drop = [column for column in upper.columns if any(upper[column].abs() > correlation_threshold)]
+        self.record_collinear = self._record_collinear_pairs(corr_matrix, correlation_threshold)
 
-        # Dataframe to hold correlated pairs
-        record_collinear = pd.DataFrame(columns = ['drop_feature', 'corr_feature', 'corr_value'])
+        # Every feature that appears as a drop feature is removed (in column order)
+        to_drop = list(pd.unique(self.record_collinear['drop_feature']))
 
-        # Iterate through the columns to drop to record pairs of correlated features
-        for column in to_drop:
+        self.ops['collinear'] = to_drop
 
-            # Find the correlated features
-            corr_features = list(upper.index[upper[column].abs() > correlation_threshold])
+        print('%d features with a correlation magnitude greater than %0.2f.\n' % (len(self.ops['collinear']), self.correlation_threshold))
 
-            # Find the correlated values
-            corr_values = list(upper[column][upper[column].abs() > correlation_threshold])
-            drop_features = [column for _ in range(len(corr_features))]    
+    def _compute_corr(self, one_hot):
+        """Correlation matrix of the features, including the one-hot encoded features if `one_hot`"""
 
-            # Record the information (need a temp df for now)
-            temp_df = pd.DataFrame.from_dict({'drop_feature': drop_features,
-                                             'corr_feature': corr_features,
-                                             'corr_value': corr_values})
+        if one_hot:
+            
+            # Cached sparse one hot encoding
+            one_hot_matrix, one_hot_columns = self.one_hot_encoding()
+            numeric = self.data.drop(columns = self.categorical_features).select_dtypes(include = [np.number, bool])
 
-            # Add to dataframe
-            record_collinear = record_collinear.append(temp_df, ignore_index = True)
+            columns = list(numeric.columns) + list(one_hot_columns)
+            return pd.DataFrame(_one_hot_corr(numeric, one_hot_matrix), index = columns, columns = columns)
 
-        self.record_collinear = record_collinear
-        self.ops['collinear'] = to_drop
-        
-        print('%d features with a correlation magnitude greater than %0.2f.\n' % (len(self.ops['collinear']), self.correlation_threshold))
+        elif self.streaming:
+            return self.stats.corr_matrix
+
+        else:
+            # Only numeric (and boolean) columns have a correlation coefficient
+            return self.data.select_dtypes(include = [np.number, bool]).corr()
+
+    @staticmethod
+    def _record_collinear_pairs(corr_matrix, correlation_threshold):
+        """
+        Extract all pairs in the upper triangle of `corr_matrix` with a correlation magnitude above
+        `correlation_threshold` in a single vectorized pass.
+
+        Returns a dataframe with columns ['drop_feature', 'corr_feature', 'corr_value'] ordered by
+        drop feature (column order) and then by correlated feature (row order).
+        """
+
+        values = corr_matrix.values
+
+        # Only the strict upper triangle (row < column) is considered, NaNs never pass the threshold
+        above = np.triu(np.abs(values) > correlation_threshold, k = 1)
+
+        # Transpose so the nonzero indices come out grouped by column (the feature to drop)
+        drop_idx, corr_idx = np.nonzero(above.T)
+
+        record_collinear = pd.DataFrame({'drop_feature': corr_matrix.columns[drop_idx],
+                                         'corr_feature': corr_matrix.index[corr_idx],
+                                         'corr_value': values[corr_idx, drop_idx]})
+
+        return record_collinear
 
     def identify_zero_importance(self, task, eval_metric=None, 
-                                 n_iterations=10, early_stopping = True):
+                                 n_iterations=10, early_stopping = True,
+                                 n_jobs = 1, random_state = None, one_hot = False):
         """
         
         Identify the features with zero importance according to a gradient boosting machine.
@@ -251,14 +663,27 @@ class FeatureSelector():
             
         early_stopping : boolean, default = True
             Whether or not to use early stopping with a validation set when training
+
+        n_jobs : int, default = 1
+            Number of iterations to train concurrently. -1 uses one worker per CPU.
+            Workers are threads sharing the same binned dataset; the LightGBM threads
+            are divided between them.
+
+        random_state : int, default = None
+            Seed used to derive one seed per iteration for the validation split and the gbm.
+            With a fixed seed the averaged importances do not depend on `n_jobs`.
+
+        one_hot : boolean, default = False
+            Whether to one-hot encode categorical features before training. By default categorical
+            features are passed to LightGBM as categoricals and importances are reported per original feature.
         
         
         Notes
         --------
         
-        - Features are one-hot encoded to handle the categorical variables before training.
+        - The features are binned into a single LightGBM dataset once; each iteration trains on index subsets of it.
         - The gbm is not optimized for any particular task and might need some hyperparameter tuning
-        - Feature importances, including zero importance features, can change across runs
+        - Feature importances, including zero importance features, can change across runs unless `random_state` is set
 
         """
 
@@ -266,60 +691,136 @@ class FeatureSelector():
             raise ValueError("""eval metric must be provided with early stopping. Examples include "auc" for classification or
                              "l2" for regression.""")
             
+        if self.streaming:
+            raise ValueError('Feature importances are not available in streaming mode.')
+
         if self.labels is None:
             raise ValueError("No training labels provided.")
+
+        if task not in ['classification', 'regression']:
+            raise ValueError('Task must be either "classification" or "regression"')
         
-        # One hot encoding
-        features = pd.get_dummies(self.data)
-        self.one_hot_features = [column for column in features.columns if column not in self.base_features]
+        # Importances depend on the labels and every setting except `n_jobs`
+        settings = (self._labels_fingerprint(), task, eval_metric, n_iterations, early_stopping, random_state, one_hot)
+
+        if one_hot:
+            # Records the one-hot features even if the importances come from the cache
+            self.one_hot_encoding()
+
+        feature_importances = self._cached('importance', settings,
+                                           lambda: self._compute_importances(task, eval_metric, n_iterations, early_stopping,
+                                                                             n_jobs, random_state, one_hot))
 
-        # Add one hot encoded data to original data
-        self.data_all = pd.concat([features[self.one_hot_features], self.data], axis = 1)
+        # Extract the features with zero importance
+        record_zero_importance = feature_importances[feature_importances['importance'] == 0.0]
+        
+        to_drop = list(record_zero_importance['feature'])
 
-        # Extract feature names
-        feature_names = list(features.columns)
+        self.feature_importances = feature_importances
+        self.record_zero_importance = record_zero_importance
+        self.one_hot_importance = one_hot
+        self.ops['zero_importance'] = to_drop
+        
+        if one_hot:
+            print('\n%d features with zero importance after one-hot encoding.\n' % len(self.ops['zero_importance']))
+        else:
+            print('\n%d features with zero importance.\n' % len(self.ops['zero_importance']))
+    
+    def _compute_importances(self, task, eval_metric, n_iterations, early_stopping, n_jobs, random_state, one_hot):
+        """Train the gbm `n_iterations` times and return the averaged, normalized feature importances"""
 
-        # Convert to np array
-        features = np.array(features)
         labels = np.array(self.labels).reshape((-1, ))
 
+        params = {'learning_rate': 0.05, 'verbose': -1}
+
+        if task == 'classification':
+
+            # Encode the classes as 0 ... n_classes - 1
+            classes, labels = np.unique(labels, return_inverse = True)
+
+            if len(classes) > 2:
+                params.update(objective = 'multiclass', num_class = len(classes))
+            else:
+                params['objective'] = 'binary'
+
+        else:
+            params['objective'] = 'regression'
+
+        if eval_metric is not None:
+            params['metric'] = eval_metric
+
+        # Bin the features once, every iteration trains on subsets of the same dataset
+        if one_hot:
+
+            # Numeric features and the cached sparse one hot encoding are binned separately and
+            # merged, so neither is duplicated into a dense or sparse float matrix of all features
+            one_hot_matrix, one_hot_columns = self.one_hot_encoding()
+
+            categorical_set = set(self.categorical_features)
+            numeric_features = [column for column in self.data.columns if column not in categorical_set]
+            feature_names = numeric_features + list(one_hot_columns)
+
+            blocks = []
+            if numeric_features:
+                blocks.append(_construct_dataset(self.data[numeric_features], labels, 0, []))
+            if len(one_hot_columns):
+                blocks.append(_construct_dataset(one_hot_matrix.astype(np.float32), labels,
+                                                 len(numeric_features), []))
+
+            dataset = blocks[0]
+            if len(blocks) > 1:
+                with warnings.catch_warnings():
+                    # The raw data is freed after binning and no feature is categorical, nothing is lost
+                    warnings.simplefilter('ignore')
+                    dataset.add_features_from(blocks[1])
+            del blocks
+
+        else:
+
+            # LightGBM handles pandas categoricals natively
+            object_features = list(self.data.select_dtypes(include = ['object']).columns)
+            features = self.data.astype({column: 'category' for column in object_features})
+
+            # Extract feature names
+            feature_names = list(features.columns)
+            categorical_features = [i for i, dtype in enumerate(features.dtypes) if isinstance(dtype, pd.CategoricalDtype)]
+
+            dataset = _construct_dataset(features, labels, 0, categorical_features)
+            del features
+
+        # One seed per iteration so each run is reproducible regardless of scheduling
+        if random_state is None:
+            seeds = [None] * n_iterations
+        else:
+            seeds = list(np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size = n_iterations))
+
+        if n_jobs is None or n_jobs < 1:
+            n_jobs = os.cpu_count() or 1
+        n_jobs = min(n_jobs, n_iterations)
+
+        # Split the LightGBM threads between concurrent runs (0 keeps the LightGBM default)
+        params['num_threads'] = 0 if n_jobs == 1 else max(1, (os.cpu_count() or 1) // n_jobs)
+        lock = Lock()
+
         # Empty array for feature importances
         feature_importance_values = np.zeros(len(feature_names))
         
         print('Training Gradient Boosting Model\n')
-        
-        # Iterate through each fold
-        for _ in range(n_iterations):
 
-            if task == 'classification':
-                model = lgb.LGBMClassifier(n_estimators=1000, learning_rate = 0.05, verbose = -1)
-
-            elif task == 'regression':
-                model = lgb.LGBMRegressor(n_estimators=1000, learning_rate = 0.05, verbose = -1)
-
-            else:
-                raise ValueError('Task must be either "classification" or "regression"')
-                
-            # If training using early stopping need a validation set
-            if early_stopping:
-                
-                train_features, valid_features, train_labels, valid_labels = train_test_split(features, labels, test_size = 0.15)
+        def fit(seed):
+            return _fit_importances(dataset, params, early_stopping, seed, lock)
 
-                # Train the model with early stopping
-                model.fit(train_features, train_labels, eval_metric = eval_metric,
-                          eval_set = [(valid_features, valid_labels)],
-                          early_stopping_rounds = 100, verbose = -1)
-                
-                # Clean up memory
-                gc.enable()
-                del train_features, train_labels, valid_features, valid_labels
-                gc.collect()
-                
-            else:
-                model.fit(features, labels)
+        if n_jobs == 1:
+            importances = [fit(seed) for seed in seeds]
+        else:
+            # LightGBM releases the GIL while training so threads run concurrently
+            # and share `dataset` without copying it into each worker
+            with ThreadPoolExecutor(max_workers = n_jobs) as executor:
+                importances = list(executor.map(fit, seeds))
 
-            # Record the feature importances
-            feature_importance_values += model.feature_importances_ / n_iterations
+        # Accumulate in iteration order so the sum is identical to the sequential run
+        for iteration_importances in importances:
+            feature_importance_values += iteration_importances / n_iterations
 
         feature_importances = pd.DataFrame({'feature': feature_names, 'importance': feature_importance_values})
 
@@ -330,17 +831,8 @@ class FeatureSelector():
         feature_importances['normalized_importance'] = feature_importances['importance'] / feature_importances['importance'].sum()
         feature_importances['cumulative_importance'] = np.cumsum(feature_importances['normalized_importance'])
 
-        # Extract the features with zero importance
-        record_zero_importance = feature_importances[feature_importances['importance'] == 0.0]
-        
-        to_drop = list(record_zero_importance['feature'])
+        return feature_importances
 
-        self.feature_importances = feature_importances
-        self.record_zero_importance = record_zero_importance
-        self.ops['zero_importance'] = to_drop
-        
-        print('\n%d features with zero importance after one-hot encoding.\n' % len(self.ops['zero_importance']))
-    
     def identify_low_importance(self, cumulative_importance):
         """
         Finds the lowest importance features not needed to account for `cumulative_importance` fraction
@@ -373,8 +865,9 @@ class FeatureSelector():
         self.record_low_importance = record_low_importance
         self.ops['low_importance'] = to_drop
     
-        print('%d features required for cumulative importance of %0.2f after one hot encoding.' % (len(self.feature_importances) -
-                                                                            len(self.record_low_importance), self.cumulative_importance))
+        print('%d features required for cumulative importance of %0.2f%s.' % (len(self.feature_importances) -
+                                                                            len(self.record_low_importance), self.cumulative_importance,
+                                                                            ' after one hot encoding' if self.one_hot_importance else ''))
         print('%d features do not contribute to cumulative importance of %0.2f.\n' % (len(self.ops['low_importance']),
                                                                                                self.cumulative_importance))
         
@@ -388,6 +881,12 @@ class FeatureSelector():
         selection_params : dict
            Parameters to use in the five feature selection methhods.
            Params must contain the keys ['missing_threshold', 'correlation_threshold', 'eval_metric', 'task', 'cumulative_importance']
+           and can contain ['n_iterations', 'n_jobs', 'random_state'] for `identify_zero_importance`.
+
+        Notes
+        --------
+            - To sweep the thresholds, create the selector with `cache = True` (or a `cache_dir`) so the
+              statistics and feature importances are only computed once
         
         """
         
@@ -400,15 +899,18 @@ class FeatureSelector():
         self.identify_missing(selection_params['missing_threshold'])
         self.identify_single_unique()
         self.identify_collinear(selection_params['correlation_threshold'])
-        self.identify_zero_importance(task = selection_params['task'], eval_metric = selection_params['eval_metric'])
+        self.identify_zero_importance(task = selection_params['task'], eval_metric = selection_params['eval_metric'],
+                                      **{param: selection_params[param] for param in ['n_iterations', 'n_jobs', 'random_state']
+                                         if param in selection_params})
         self.identify_low_importance(selection_params['cumulative_importance'])
         
         # Find the number of features identified to drop
         self.all_identified = set(list(chain(*list(self.ops.values()))))
         self.n_identified = len(self.all_identified)
         
+        n_features = len(self.base_features) + (0 if self.one_hot_features is None else len(self.one_hot_features))
         print('%d total features out of %d identified for removal after one-hot encoding.\n' % (self.n_identified, 
-                                                                                                  self.data_all.shape[1]))
+                                                                                                  n_features))
         
     def check_removal(self, keep_one_hot=True):
         
@@ -427,7 +929,7 @@ class FeatureSelector():
         return list(self.all_identified)
         
     
-    def remove(self, methods, keep_one_hot = True):
+    def remove(self, methods, keep_one_hot = True, lazy = False, output = None, chunksize = 100000):
         """
         Remove the features from the data according to the specified methods.
         
@@ -439,17 +941,27 @@ class FeatureSelector():
                 Can be one of ['missing', 'single_unique', 'collinear', 'zero_importance', 'low_importance']
             keep_one_hot : boolean, default = True
                 Whether or not to keep one-hot encoded features
+            lazy : boolean, default = False
+                Return a `FeatureProjection` of the remaining features instead of a new dataframe.
+                Nothing is copied until the projection is read.
+            output : string, default = None
+                Parquet file to write the reduced dataset to, `chunksize` rows at a time.
+                The `FeatureProjection` is returned after writing.
+            chunksize : int, default = 100000
+                Number of rows per chunk when writing `output` or reading a streamed source file
                 
         Return
         --------
-            data : dataframe
-                Dataframe with identified features removed
+            data : dataframe or FeatureProjection
+                Dataframe with identified features removed (a projection if `lazy` or `output` is given)
                 
         
         Notes 
         --------
             - If feature importances are used, the one-hot encoded columns will be added to the data (and then may be removed)
             - Check the features that will be removed before transforming data!
+            - In streaming mode the remaining features are read from the source file, so they must fit in memory
+              unless `lazy` or `output` is used
         
         """
         
@@ -459,7 +971,7 @@ class FeatureSelector():
         if methods == 'all':
             
             # Need to use one-hot encoded data as well
-            data = self.data_all
+            use_one_hot = True
                                           
             print('{} methods have been run\n'.format(list(self.ops.keys())))
             
@@ -468,11 +980,7 @@ class FeatureSelector():
             
         else:
             # Need to use one-hot encoded data as well
-            if 'zero_importance' in methods or 'low_importance' in methods or self.one_hot_correlated:
-                data = self.data_all
-                
-            else:
-                data = self.data
+            use_one_hot = 'zero_importance' in methods or 'low_importance' in methods or self.one_hot_correlated
                 
             # Iterate through the specified methods
             for method in methods:
@@ -498,8 +1006,25 @@ class FeatureSelector():
                              
                 features_to_drop = list(set(features_to_drop) | set(self.one_hot_features))
        
-        # Remove the features and return the data
-        data = data.drop(columns = features_to_drop)
+        # Projection onto the remaining features, nothing is copied yet
+        drop = set(features_to_drop)
+        keep = [column for column in self.base_features if column not in drop]
+
+        # Add the remaining one-hot features from the cached encoding
+        one_hot = None
+        if use_one_hot and self.one_hot_features is not None:
+            one_hot = self._one_hot_subset([column for column in self.one_hot_features if column not in drop])
+
+        # Only the remaining features are read from a streamed file
+        data = FeatureProjection(keep, data = self.data, one_hot = one_hot, source = self.source,
+                                 chunksize = chunksize)
+
+        if output is not None:
+            data.to_parquet(output, chunksize = chunksize)
+
+        elif not lazy:
+            data = data.to_pandas()
+
         self.removed_features = features_to_drop
         
         if not keep_one_hot:
@@ -538,10 +1063,26 @@ class FeatureSelector():
         plt.title('Number of Unique Values Histogram', size = 16);
         
     
-    def plot_collinear(self, plot_all = False):
+    def plot_collinear(self, plot_all = False, max_size = 100, cluster = True, aggregate = 'mean'):
         """
         Heatmap of the correlation values. If plot_all = True plots all the correlations otherwise
         plots only those features that have a correlation above the threshold
+
+        Parameters
+        --------
+            plot_all : boolean, default = False
+                Whether to plot all correlations or only the features with a correlation above the threshold
+
+            max_size : int, default = 100
+                Largest number of rows or columns drawn individually. Larger matrices are drawn as an
+                overview of blocks of features, so the plot time does not grow with the number of features.
+
+            cluster : boolean, default = True
+                For the overview of all correlations, order the features by hierarchical clustering first
+                so correlated features fall in the same blocks
+
+            aggregate : string, default = 'mean'
+                How the correlations in a block are summarized, 'mean' or 'max_abs' (largest magnitude)
         
         Notes
         --------
@@ -549,6 +1090,8 @@ class FeatureSelector():
             all the variables that have been idenfitied as having even one correlation above the threshold
             - The features on the x-axis are those that will be removed. The features on the y-axis
             are the correlated features with those on the x-axis
+            - For an overview the blocks of features are saved in `corr_blocks` (row blocks) and can be
+            drawn in detail with `plot_collinear_tiles`
         
         Code adapted from https://seaborn.pydata.org/examples/many_pairwise_correlations.html
         """
@@ -568,6 +1111,9 @@ class FeatureSelector():
 
 	        title = "Correlations Above Threshold"
 
+        if max(corr_matrix_plot.shape) > max_size:
+            self._plot_corr_overview(corr_matrix_plot, title, max_size, cluster and plot_all, aggregate)
+            return
        
         f, ax = plt.subplots(figsize=(10, 8))
         
@@ -587,6 +1133,89 @@ class FeatureSelector():
         ax.set_xticklabels(list(corr_matrix_plot.columns), size = int(160 / corr_matrix_plot.shape[1]));
         plt.title(title, size = 14)
         
+    def _plot_corr_overview(self, corr_matrix_plot, title, max_size, cluster, aggregate):
+        """Draw a correlation matrix larger than `max_size` as a downsampled image of blocks of features"""
+
+        rows, columns = list(corr_matrix_plot.index), list(corr_matrix_plot.columns)
+        values = corr_matrix_plot.values
+
+        # Hierarchical ordering (only for the square matrix of all correlations)
+        if cluster:
+            order = _cluster_order(values)
+            values = values[np.ix_(order, order)]
+            rows = columns = [rows[i] for i in order]
+
+        block_size = (int(np.ceil(len(rows) / max_size)), int(np.ceil(len(columns) / max_size)))
+        blocks = _aggregate_blocks(values, block_size, aggregate)
+
+        # Features in each block, for drilling down with `plot_collinear_tiles`
+        self.corr_order = rows
+        self.corr_blocks = [rows[i:i + block_size[0]] for i in range(0, len(rows), block_size[0])]
+
+        f, ax = plt.subplots(figsize=(10, 8))
+
+        # A single image, so the drawing cost only depends on the number of blocks
+        cmap = sns.diverging_palette(220, 10, as_cmap=True)
+        image = ax.imshow(blocks, cmap = cmap, vmin = -1, vmax = 1, aspect = 'auto', interpolation = 'nearest')
+        plt.colorbar(image, ax = ax, shrink = 0.6)
+
+        # Label every few blocks with the first feature in the block
+        n_labels = 20
+        row_ticks = np.arange(0, blocks.shape[0], max(1, blocks.shape[0] // n_labels))
+        col_ticks = np.arange(0, blocks.shape[1], max(1, blocks.shape[1] // n_labels))
+        ax.set_yticks(row_ticks)
+        ax.set_yticklabels(['%d: %s' % (i, rows[i * block_size[0]]) for i in row_ticks], size = 8)
+        ax.set_xticks(col_ticks)
+        ax.set_xticklabels([columns[i * block_size[1]] for i in col_ticks], size = 8, rotation = 90)
+
+        plt.title('%s (%d x %d features in blocks of %d x %d)' % (title, len(rows), len(columns),
+                                                                   block_size[0], block_size[1]), size = 14)
+
+    def plot_collinear_tiles(self, groups, ncols = 3):
+        """
+        Drill down into groups of features with one correlation heatmap tile per group.
+
+        Parameters
+        --------
+            groups : list
+                Each group is either a list of features or the index of a block of features
+                from the last overview drawn by `plot_collinear` (see the y-axis labels)
+
+            ncols : int, default = 3
+                Number of tiles per row
+        """
+
+        if self.corr_matrix is None:
+            raise NotImplementedError('Collinear features have not been idenfitied. Run `identify_collinear`.')
+
+        titles = ['Block %d' % group if isinstance(group, (int, np.integer)) else 'Group %d' % i for i, group in enumerate(groups)]
+        groups = [self.corr_blocks[group] if isinstance(group, (int, np.integer)) else list(group) for group in groups]
+
+        ncols = min(ncols, len(groups))
+        nrows = int(np.ceil(len(groups) / ncols))
+        f, axes = plt.subplots(nrows, ncols, figsize = (5 * ncols, 4.5 * nrows), squeeze = False)
+
+        cmap = sns.diverging_palette(220, 10, as_cmap=True)
+
+        for i, ax in enumerate(axes.ravel()):
+            if i >= len(groups):
+                ax.axis('off')
+                continue
+
+            tile = self.corr_matrix.loc[groups[i], groups[i]]
+            image = ax.imshow(tile.values, cmap = cmap, vmin = -1, vmax = 1, interpolation = 'nearest')
+
+            # Only label tiles small enough to read
+            if len(groups[i]) <= 40:
+                ax.set_xticks(range(len(groups[i])))
+                ax.set_xticklabels(groups[i], size = max(4, int(160 / len(groups[i]) / ncols)), rotation = 90)
+                ax.set_yticks(range(len(groups[i])))
+                ax.set_yticklabels(groups[i], size = max(4, int(160 / len(groups[i]) / ncols)))
+
+            ax.set_title('%s (%d features)' % (titles[i], len(groups[i])), size = 12)
+
+        f.colorbar(image, ax = axes.ravel().tolist(), shrink = 0.6)
+
     def plot_feature_importances(self, plot_n = 15, threshold = None):
         """
         Plots `plot_n` most important features and the cumulative importance of features.
@@ -0,0 +1,152 @@
+# pandas for data manipulation
+import pandas as pd
+
+from .streaming import read_chunks
+
+
+class FeatureProjection():
+    """
+    Lazily evaluated subset of the features of a dataset, returned by `FeatureSelector.remove(lazy = True)`.
+
+    Nothing is copied when the projection is created. The remaining features are only read when
+    a column is accessed, when the rows are iterated in chunks or when the projection is materialized
+    or written to Parquet, and then at most one chunk of rows is copied at a time.
+
+    Parameters
+    --------
+        columns : list
+            Features of the source to keep (in order)
+
+        data : dataframe, default = None
+            In-memory source dataset
+
+        one_hot : tuple of (sparse matrix, column names), default = None
+            One-hot encoded features to keep, placed before `columns` as in `FeatureSelector.data_all`
+
+        source : string, default = None
+            CSV or Parquet file to read the features from when there is no in-memory `data`
+
+        chunksize : int, default = 100000
+            Default number of rows per chunk
+    """
+
+    def __init__(self, columns, data=None, one_hot=None, source=None, chunksize=100000):
+
+        if data is None and source is None:
+            raise ValueError('Either data or a source file must be provided.')
+
+        self.base_columns = list(columns)
+        self.data = data
+        self.source = source
+        self.chunksize = chunksize
+
+        if one_hot is None:
+            one_hot = (None, pd.Index([]))
+        self.one_hot_matrix, self.one_hot_columns = one_hot
+
+        # Compressed rows allow cheap row slicing of the one-hot features
+        if self.one_hot_matrix is not None:
+            self.one_hot_matrix = self.one_hot_matrix.tocsr()
+
+    @property
+    def columns(self):
+        """Names of the remaining features"""
+        return list(self.one_hot_columns) + self.base_columns
+
+    @property
+    def shape(self):
+        """Shape of the projected dataset (rows are unknown, None, for a file source)"""
+        n_rows = self.data.shape[0] if self.data is not None else None
+        return (n_rows, len(self.columns))
+
+    @property
+    def n_features(self):
+        """Number of remaining features (there is no `len`, which is the row count for a dataframe)"""
+        return len(self.one_hot_columns) + len(self.base_columns)
+
+    def __getitem__(self, column):
+        """A single remaining feature. In-memory features are returned without copying."""
+
+        if column in self.one_hot_columns:
+            idx = self.one_hot_columns.get_loc(column)
+            values = self.one_hot_matrix[:, idx].toarray().ravel()
+            return pd.Series(values, index = self.data.index if self.data is not None else None, name = column)
+
+        if column not in self.base_columns:
+            raise KeyError(column)
+
+        if self.data is not None:
+            return self.data[column]
+
+        return pd.concat([chunk[column] for chunk in read_chunks(self.source, self.chunksize, columns = [column])],
+                         ignore_index = True)
+
+    def iter_chunks(self, chunksize=None):
+        """Iterate over the remaining features as dataframes of at most `chunksize` rows"""
+
+        chunksize = chunksize or self.chunksize
+
+        if self.data is None:
+            for chunk in read_chunks(self.source, chunksize = chunksize, columns = self.base_columns):
+                # Keep the requested column order (readers return file order)
+                yield chunk[self.base_columns]
+            return
+
+        for start in range(0, self.data.shape[0], chunksize):
+            stop = min(start + chunksize, self.data.shape[0])
+
+            # Row slices are views, only the selected rows of the kept columns are copied
+            chunk = self.data.iloc[start:stop][self.base_columns]
+
+            if len(self.one_hot_columns):
+                one_hot = pd.DataFrame(self.one_hot_matrix[start:stop].toarray(), index = chunk.index,
+                                       columns = self.one_hot_columns)
+                chunk = pd.concat([one_hot, chunk], axis = 1)
+
+            yield chunk
+
+    def to_pandas(self):
+        """Materialize the projection as a dataframe (one-hot features as sparse columns)"""
+
+        if self.data is None:
+            return pd.concat(list(self.iter_chunks()), ignore_index = True)
+
+        data = self.data[self.base_columns]
+
+        if len(self.one_hot_columns):
+            one_hot = pd.DataFrame.sparse.from_spmatrix(self.one_hot_matrix, index = self.data.index,
+                                                        columns = self.one_hot_columns)
+            data = pd.concat([one_hot, data], axis = 1)
+
+        return data
+
+    def to_parquet(self, path, chunksize=None, compression='snappy'):
+        """
+        Write the projection to a Parquet file one chunk of rows at a time, so at most one chunk is
+        held in memory. Every chunk is written with the schema of the first chunk.
+        """
+
+        # pyarrow is only needed for Parquet output
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('pyarrow is required to write Parquet files.')
+
+        writer = None
+
+        try:
+            for chunk in self.iter_chunks(chunksize):
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index = False)
+                    writer = pq.ParquetWriter(path, table.schema, compression = compression)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema = writer.schema, preserve_index = False)
+
+                writer.write_table(table)
+
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return path
@@ -0,0 +1,333 @@
+# numpy and pandas for data manipulation
+import pandas as pd
+import numpy as np
+
+import os
+
+
+def read_chunks(path, chunksize=100000, columns=None):
+    """
+    Read a CSV or Parquet file as an iterator of dataframes with at most `chunksize` rows.
+
+    Files ending in `.parquet` or `.pq` are read by record batch with pyarrow, everything else with `pd.read_csv`.
+    """
+
+    if os.path.splitext(path)[1].lower() in ['.parquet', '.pq']:
+
+        # pyarrow is only needed for Parquet input
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('pyarrow is required to read Parquet files.')
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size = chunksize, columns = columns):
+            yield batch.to_pandas()
+
+    else:
+        for chunk in pd.read_csv(path, chunksize = chunksize, usecols = columns):
+            yield chunk
+
+
+def _corr_from_moments(n, sum_x, sum_xx, sum_xy):
+    """
+    Pearson correlations from pairwise-complete moments.
+
+    For features i and j, over the rows where both are present: `n[i, j]` is the number of rows,
+    `sum_x[i, j]` and `sum_xx[i, j]` are the sum and sum of squares of feature i and `sum_xy[i, j]`
+    is the sum of products. This matches `DataFrame.corr()`, which also uses pairwise-complete rows.
+    """
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        cov = n * sum_xy - sum_x * sum_x.T
+        var = n * sum_xx - sum_x ** 2
+        denom = np.sqrt(var * var.T)
+
+        corr = cov / denom
+
+    # Constant features (or pairs with too few rows) have no correlation
+    corr[~(denom > 0)] = np.nan
+    np.clip(corr, -1, 1, out = corr)
+
+    diagonal = np.diag(corr).copy()
+    np.fill_diagonal(corr, np.where(np.isnan(diagonal), np.nan, 1.0))
+
+    return corr
+
+
+def _bit_length(values):
+    """Number of significant bits of each uint64 in `values`"""
+
+    values = values.copy()
+    length = np.zeros(values.shape, dtype = np.uint8)
+
+    # Binary search on the position of the highest set bit
+    for shift in [32, 16, 8, 4, 2, 1]:
+        high = (values >> np.uint64(shift)) > 0
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+
+    length += (values > 0).astype(np.uint8)
+
+    return length
+
+
+class HyperLogLog():
+    """
+    HyperLogLog sketch for estimating the number of distinct values of a stream.
+
+    Sketches of the same `precision` can be merged, so partial results from chunks or files
+    combine into the sketch of the whole dataset.
+
+    Parameters
+    --------
+        precision : int, default = 12
+            Number of hash bits used to select a register. Uses 2 ** precision bytes and
+            has a relative error of about 1.04 / sqrt(2 ** precision) (1.6% for 12).
+    """
+
+    def __init__(self, precision=12):
+
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype = np.uint8)
+
+    def add_hashes(self, hashes):
+        """Add an array of uint64 hashes to the sketch"""
+
+        hashes = np.asarray(hashes, dtype = np.uint64)
+        if len(hashes) == 0:
+            return
+
+        # The top bits select the register, the rank is the position of the first set bit in the rest
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes << np.uint64(self.precision)
+        rank = np.minimum(64 - _bit_length(rest).astype(np.int64) + 1, 64 - self.precision + 1)
+
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        """Combine with another sketch of the same precision (in place)"""
+
+        if other.precision != self.precision:
+            raise ValueError('Can only merge HyperLogLog sketches with the same precision.')
+
+        np.maximum(self.registers, other.registers, out = self.registers)
+
+        return self
+
+    def count(self):
+        """Estimated number of distinct values added"""
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+
+        # Linear counting is more accurate for small cardinalities
+        n_zero = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and n_zero > 0:
+            estimate = m * np.log(m / n_zero)
+
+        return estimate
+
+
+class StreamingStats():
+    """
+    Mergeable statistics for feature selection accumulated one chunk of rows at a time.
+
+    After a single pass over the data this holds everything `identify_missing`, `identify_single_unique`
+    and `identify_collinear` need, so those methods work on datasets that do not fit in memory.
+
+        - The number of missing values of every feature
+        - A HyperLogLog sketch of the distinct values of every feature and the minimum and maximum
+          value hash, which detects single unique features exactly (up to hash collisions)
+        - Pairwise-complete counts, sums, sums of squares and cross-products of the numeric features
+
+    Parameters
+    --------
+        hll_precision : int, default = 12
+            Precision of the HyperLogLog sketches (see `HyperLogLog`)
+
+    Notes
+    --------
+        - Numeric features are those with a numeric or boolean dtype in the first chunk.
+        - The correlation moments take 4 * n_numeric ** 2 floats of memory.
+        - Numeric values are hashed as float64 so 1 and 1.0 count as the same value, as in `nunique`.
+    """
+
+    def __init__(self, hll_precision=12):
+
+        self.hll_precision = hll_precision
+
+        self.columns = None
+        self.numeric_columns = None
+        self.n_rows = 0
+
+        self.missing = None
+        self.sketches = None
+        self.min_hash = None
+        self.max_hash = None
+
+        # Values are shifted by `shift` before accumulating to limit cancellation
+        self.shift = None
+        self.n = None
+        self.sum_x = None
+        self.sum_xx = None
+        self.sum_xy = None
+
+    @classmethod
+    def from_file(cls, path, chunksize=100000, columns=None, hll_precision=12):
+        """Accumulate the statistics of a CSV or Parquet file in one pass (see `read_chunks`)"""
+
+        stats = cls(hll_precision = hll_precision)
+
+        for chunk in read_chunks(path, chunksize = chunksize, columns = columns):
+            stats.update(chunk)
+
+        return stats
+
+    def _initialize(self, chunk):
+        """Set up empty statistics for the columns of the first chunk"""
+
+        self.columns = list(chunk.columns)
+        self.numeric_columns = list(chunk.select_dtypes(include = [np.number, bool]).columns)
+
+        n_columns = len(self.columns)
+        n_numeric = len(self.numeric_columns)
+
+        self.missing = np.zeros(n_columns, dtype = np.int64)
+        self.sketches = [HyperLogLog(self.hll_precision) for _ in range(n_columns)]
+        self.min_hash = np.full(n_columns, np.iinfo(np.uint64).max, dtype = np.uint64)
+        self.max_hash = np.zeros(n_columns, dtype = np.uint64)
+
+        # Shift by the mean of the first chunk (0 for features that are all missing)
+        shift = chunk[self.numeric_columns].astype(np.float64).mean().values
+        self.shift = np.where(np.isnan(shift), 0.0, shift)
+
+        self.n = np.zeros((n_numeric, n_numeric))
+        self.sum_x = np.zeros((n_numeric, n_numeric))
+        self.sum_xx = np.zeros((n_numeric, n_numeric))
+        self.sum_xy = np.zeros((n_numeric, n_numeric))
+
+    def update(self, chunk):
+        """Add a dataframe of rows to the statistics"""
+
+        if self.columns is None:
+            self._initialize(chunk)
+
+        elif list(chunk.columns) != self.columns:
+            raise ValueError('All chunks must have the same columns.')
+
+        self.n_rows += chunk.shape[0]
+        self.missing += chunk.isnull().sum().values
+
+        numeric = set(self.numeric_columns)
+
+        for i, column in enumerate(self.columns):
+            values = chunk[column].dropna()
+            if len(values) == 0:
+                continue
+
+            # Hash numbers as float64 (+ 0.0 turns -0.0 into 0.0) so equal values hash equally
+            if column in numeric:
+                values = values.astype(np.float64) + 0.0
+
+            hashes = pd.util.hash_pandas_object(values, index = False).values
+
+            self.sketches[i].add_hashes(hashes)
+            self.min_hash[i] = min(self.min_hash[i], hashes.min())
+            self.max_hash[i] = max(self.max_hash[i], hashes.max())
+
+        # Pairwise-complete moments, missing values contribute zero
+        values = chunk[self.numeric_columns].values.astype(np.float64) - self.shift
+        present = ~np.isnan(values)
+        values[~present] = 0.0
+        present = present.astype(np.float64)
+
+        self.n += present.T @ present
+        self.sum_x += values.T @ present
+        self.sum_xx += (values ** 2).T @ present
+        self.sum_xy += values.T @ values
+
+        return self
+
+    def _recenter(self, shift):
+        """Express the moments relative to a new `shift`"""
+
+        delta = (self.shift - shift)[:, np.newaxis]
+
+        sum_x = self.sum_x + self.n * delta
+        self.sum_xx = self.sum_xx + 2 * delta * self.sum_x + self.n * delta ** 2
+        self.sum_xy = self.sum_xy + delta.T * self.sum_x + delta * self.sum_x.T + self.n * delta * delta.T
+        self.sum_x = sum_x
+        self.shift = shift
+
+    def merge(self, other):
+        """Combine with the statistics of other rows with the same columns (in place)"""
+
+        if other.columns is None:
+            return self
+
+        if self.columns is None:
+            self.__dict__.update(other.copy().__dict__)
+            return self
+
+        if other.columns != self.columns or other.numeric_columns != self.numeric_columns:
+            raise ValueError('Can only merge statistics with the same columns.')
+
+        if not np.array_equal(other.shift, self.shift):
+            other = other.copy()
+            other._recenter(self.shift)
+
+        self.n_rows += other.n_rows
+        self.missing += other.missing
+
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+
+        np.minimum(self.min_hash, other.min_hash, out = self.min_hash)
+        np.maximum(self.max_hash, other.max_hash, out = self.max_hash)
+
+        self.n += other.n
+        self.sum_x += other.sum_x
+        self.sum_xx += other.sum_xx
+        self.sum_xy += other.sum_xy
+
+        return self
+
+    def copy(self):
+        """Independent copy of the statistics"""
+
+        stats = StreamingStats(self.hll_precision)
+        stats.__dict__.update({name: (value.copy() if isinstance(value, np.ndarray) else value)
+                               for name, value in self.__dict__.items()})
+        stats.columns = list(self.columns)
+        stats.numeric_columns = list(self.numeric_columns)
+        stats.sketches = [HyperLogLog(sketch.precision).merge(sketch) for sketch in self.sketches]
+
+        return stats
+
+    @property
+    def missing_fraction(self):
+        """Fraction of missing values in each feature"""
+        return pd.Series(self.missing / self.n_rows, index = self.columns)
+
+    @property
+    def nunique(self):
+        """
+        Number of unique values in each feature (NaNs not counted). Exact for features with
+        zero or one unique value, a HyperLogLog estimate (at least 2) otherwise.
+        """
+
+        counts = np.array([max(2, int(round(sketch.count()))) for sketch in self.sketches])
+
+        counts[self.min_hash == self.max_hash] = 1
+        counts[self.missing == self.n_rows] = 0
+
+        return pd.Series(counts, index = self.columns)
+
+    @property
+    def corr_matrix(self):
+        """Pairwise-complete Pearson correlations between the numeric features"""
+
+        corr = _corr_from_moments(self.n, self.sum_x, self.sum_xx, self.sum_xy)
+
+        return pd.DataFrame(corr, index = self.numeric_columns, columns = self.numeric_columns)
@@ -9,11 +9,12 @@ setup(name="feature_selector",
         license="N/A",
         packages=["feature_selector"],
         install_requires=[
-            "lightgbm>=2.1.1",
+            "lightgbm>=4.0.0",
             "matplotlib>=2.1.2",
             "seaborn>=0.8.1",
-            "numpy>=1.14.5",
-            "pandas>=0.23.1",
+            "numpy>=1.15.0",
+            "pandas>=0.25.0",
+            "scipy>=1.1.0",
             "scikit-learn>=0.19.1"
             ],
         zip_safe=False)
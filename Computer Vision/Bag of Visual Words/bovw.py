@@ -0,0 +1,210 @@
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+# Bag of Visual Words pipeline of Bag of Visual Words.ipynb, with SIFT extracted once per image in
+# a process pool and stored on disk:
+#
+#     store = extract_features(sorted(glob.glob('train/*.jpg')), 'features')
+#     k_means = build_vocabulary(store, 100)          # or train_vocabulary(store, 10000) for large vocabularies
+#     bags_of_visual_words = frequency_histograms(store, k_means)
+#     histogram = frequency_histogram(describe('test/20.jpg'), k_means)
+
+DESCRIPTOR_SIZE = 128
+
+
+def sift():
+    # Imported here so the rest of the pipeline (stores, vocabularies, histograms) works without OpenCV.
+    # SIFT moved out of xfeatures2d (contrib) into the main module in OpenCV 4.4
+    import cv2
+    if hasattr(cv2, 'SIFT_create'):
+        return cv2.SIFT_create()
+    return cv2.xfeatures2d.SIFT_create()
+
+
+def load_image(path, size=(250, 250)):
+    # Same preprocessing as the notebook
+    return np.asarray(Image.open(path).resize(size))
+
+
+def describe(path, size=(250, 250)):
+    # SIFT descriptors of one image as a float32 (n, 128) array, empty if no keypoint is found
+    keypoints, descriptors = sift().detectAndCompute(load_image(path, size), None)
+    if descriptors is None:
+        return np.empty((0, DESCRIPTOR_SIZE), dtype=np.float32)
+    return descriptors.astype(np.float32, copy=False)
+
+
+class DescriptorStore:
+    # Descriptors of many images in one float32 memory-mapped file, image i owning rows
+    # offsets[i]:offsets[i + 1]. The file grows by doubling, so appending n descriptors costs O(n)
+    # overall instead of copying everything on every image like np.append.
+    #
+    # The directory holds descriptors.f32 (raw rows, possibly with unused capacity at the end),
+    # offsets.npy and store.json (paths of the images and descriptor size).
+
+    def __init__(self, directory, mode='r', dim=DESCRIPTOR_SIZE):
+        # mode 'w' creates an empty store (replacing any existing one), 'a' appends to an existing one,
+        # 'r' opens it read-only
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError("mode must be 'r', 'a' or 'w'")
+        self.directory = directory
+        self.mode = mode
+        self.data = None
+        if mode == 'w':
+            os.makedirs(directory, exist_ok=True)
+            self.dim = dim
+            self.paths = []
+            self.offsets = [0]
+            open(self.data_path, 'wb').close()
+            self.save()
+        else:
+            with open(os.path.join(directory, 'store.json')) as f:
+                meta = json.load(f)
+            self.dim = meta['dim']
+            self.paths = meta['paths']
+            self.offsets = np.load(os.path.join(directory, 'offsets.npy')).tolist()
+        self.open()
+
+    @property
+    def data_path(self):
+        return os.path.join(self.directory, 'descriptors.f32')
+
+    def open(self):
+        # Mapping the whole file, including the unused capacity
+        rows = os.path.getsize(self.data_path) // (4 * self.dim)
+        if rows == 0:
+            self.data = np.empty((0, self.dim), dtype=np.float32)
+        else:
+            self.data = np.memmap(self.data_path, dtype=np.float32, mode='r' if self.mode == 'r' else 'r+',
+                                  shape=(rows, self.dim))
+
+    def reserve(self, rows):
+        # Doubling the file until it has room for rows descriptors
+        if rows <= len(self.data):
+            return
+        capacity = max(rows, 2 * len(self.data), 1024)
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+        self.data = None
+        with open(self.data_path, 'r+b') as f:
+            f.truncate(capacity * self.dim * 4)
+        self.open()
+
+    def append(self, descriptors, path=None):
+        # Adding the descriptors of one image, returning its index
+        if self.mode == 'r':
+            raise ValueError("Store is opened read-only")
+        descriptors = np.asarray(descriptors, dtype=np.float32).reshape(-1, self.dim)
+        start = self.offsets[-1]
+        self.reserve(start + len(descriptors))
+        self.data[start:start + len(descriptors)] = descriptors
+        self.offsets.append(start + len(descriptors))
+        self.paths.append(path)
+        return len(self.paths) - 1
+
+    def save(self):
+        # Writing the offsets and paths, which make the appended descriptors visible to readers
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+        np.save(os.path.join(self.directory, 'offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+        with open(os.path.join(self.directory, 'store.json'), 'w') as f:
+            json.dump({'dim': self.dim, 'paths': self.paths}, f)
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def descriptors(self):
+        # All descriptors of all images, (n, dim), without the unused capacity (a view, not a copy)
+        return self.data[:self.offsets[-1]]
+
+    def image(self, i):
+        # Descriptors of image i (a view)
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+
+def extract_features(paths, directory, workers=None, size=(250, 250), append=False):
+    # Running SIFT once per image across a process pool and storing the descriptors in the order of paths
+    store = DescriptorStore(directory, 'a' if append else 'w')
+    with ProcessPoolExecutor(workers) as pool:
+        # Only the parent writes to the store, the workers only send back their descriptors
+        for path, descriptors in zip(paths, pool.map(describe, paths, [size] * len(paths), chunksize=4)):
+            store.append(descriptors, path)
+    store.save()
+    return store
+
+
+def build_vocabulary(store, n_clusters=100, **kwargs):
+    # k-means visual words fitted on every descriptor in the store
+    k_means = KMeans(n_clusters=n_clusters, **kwargs)
+    k_means.fit(store.descriptors)
+    return k_means
+
+
+def train_vocabulary(store, n_words=1000, batch_size=10000, n_epochs=1, random_state=None, **kwargs):
+    # MiniBatchKMeans visual words trained on random batches of descriptors read from the store one at a
+    # time, so the vocabulary size (10k+ words) and the number of descriptors are not limited by memory.
+    # The first batch initialises the centres, so it holds 3 descriptors per word when the store has them
+    descriptors = store.descriptors
+    if len(descriptors) < n_words:
+        raise ValueError("%d words need at least as many descriptors, the store has %d"
+                         % (n_words, len(descriptors)))
+    k_means = MiniBatchKMeans(n_clusters=n_words, batch_size=batch_size, random_state=random_state, **kwargs)
+    rng = np.random.RandomState(random_state)
+    first = min(max(batch_size, 3 * n_words), len(descriptors))
+    for epoch in range(n_epochs):
+        order = rng.permutation(len(descriptors))
+        start = 0
+        while start < len(order):
+            size = first if epoch == 0 and start == 0 else batch_size
+            # Sorted indices read the memory map front to back
+            batch = np.asarray(descriptors[np.sort(order[start:start + size])])
+            k_means.partial_fit(batch)
+            start += size
+    return k_means
+
+
+def assign_words(descriptors, centers, chunk_size=None):
+    # Nearest visual word of every descriptor, in chunks of descriptors so that the chunk x words distance
+    # matrix stays around 4M values. argmin ||x - c||^2 = argmin ||c||^2 - 2 x.c, ||x||^2 being the same for all words
+    centers = np.asarray(centers, dtype=np.float32)
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    if chunk_size is None:
+        chunk_size = max(1, (1 << 22) // len(centers))
+    words = np.empty(len(descriptors), dtype=np.int64)
+    for start in range(0, len(descriptors), chunk_size):
+        chunk = np.asarray(descriptors[start:start + chunk_size], dtype=np.float32)
+        distances = center_norms - 2 * (chunk @ centers.T)
+        words[start:start + chunk_size] = np.argmin(distances, axis=1)
+    return words
+
+
+def word_histograms(words, offsets, n_words):
+    # Per-image visual word counts from the words of all descriptors and the image offsets, in one bincount
+    offsets = np.asarray(offsets)
+    image = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    counts = np.bincount(image * n_words + words, minlength=(len(offsets) - 1) * n_words)
+    return counts.reshape(len(offsets) - 1, n_words).astype(np.float64)
+
+
+def frequency_histogram(descriptors, k_means):
+    # Visual word counts of one image
+    centers = k_means.cluster_centers_
+    return word_histograms(assign_words(descriptors, centers), [0, len(descriptors)], len(centers))[0]
+
+
+def frequency_histograms(store, k_means):
+    # Histograms of all the images in the store, (n_images, n_words), from a single pass over the descriptors
+    centers = k_means.cluster_centers_
+    return word_histograms(assign_words(store.descriptors, centers), store.offsets, len(centers))
+
+
+if __name__ == '__main__':
+    store = extract_features(sorted(glob.glob('train/*.jpg')), 'features')
+    print('%d descriptors from %d images' % (store.offsets[-1], len(store)))
@@ -0,0 +1,151 @@
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+# Hierarchical k-means vocabulary tree (Nister & Stewenius, "Scalable Recognition with a Vocabulary Tree")
+# and a TF-IDF inverted file for image retrieval over its words.
+#
+# A tree with branching b and depth L has b^L visual words (the leaves). Assigning a descriptor walks
+# down from the root comparing it with the b children of one node per level, b * L distances instead of
+# the b^L of a flat vocabulary:
+#
+#     tree = VocabularyTree(branching=10, depth=4).fit(store.descriptors)     # 10,000 words
+#     histograms = word_histograms(tree.predict(store.descriptors), store.offsets, tree.n_words)
+#     index = InvertedIndex().fit(histograms)
+#     images, scores = index.query(query_histogram, k=10)
+
+
+class VocabularyTree:
+
+    def __init__(self, branching=10, depth=3, max_samples=100000, random_state=None):
+        # max_samples bounds the descriptors clustered at each node (MiniBatchKMeans above 10 * branching^2)
+        if branching < 2 or depth < 1:
+            raise ValueError("branching must be at least 2 and depth at least 1")
+        self.branching = branching
+        self.depth = depth
+        self.max_samples = max_samples
+        self.random_state = random_state
+        # centers[level] is (branching^level, branching, dim): the children of every node of that level
+        self.centers = None
+
+    @property
+    def n_words(self):
+        return self.branching ** self.depth
+
+    def cluster(self, descriptors, rng):
+        # b centres for the descriptors of one node. Nodes with at most b descriptors use them
+        # as centres, repeated so the tree stays complete (the repeats just never win)
+        b = self.branching
+        if len(descriptors) > self.max_samples:
+            descriptors = descriptors[np.sort(rng.choice(len(descriptors), self.max_samples, replace=False))]
+        if len(descriptors) == 0:
+            return None
+        if len(descriptors) <= b:
+            return descriptors[np.arange(b) % len(descriptors)].astype(np.float32)
+        seed = rng.randint(2 ** 31 - 1)
+        if len(descriptors) > 10 * b * b:
+            k_means = MiniBatchKMeans(n_clusters=b, n_init=3, random_state=seed)
+        else:
+            k_means = KMeans(n_clusters=b, n_init=1, random_state=seed)
+        return k_means.fit(descriptors).cluster_centers_.astype(np.float32)
+
+    def fit(self, descriptors):
+        descriptors = np.asarray(descriptors, dtype=np.float32)
+        rng = np.random.RandomState(self.random_state)
+        b = self.branching
+        self.centers = []
+        # Descriptors of every node of the current level, as index arrays into descriptors
+        members = [np.arange(len(descriptors))]
+        for level in range(self.depth):
+            centers = np.empty((b ** level, b, descriptors.shape[1]), dtype=np.float32)
+            children = []
+            for node, index in enumerate(members):
+                node_centers = self.cluster(descriptors[index], rng)
+                if node_centers is None:
+                    # A node nothing reached: copy its parent's centre so lookups stay defined
+                    node_centers = np.repeat(self.centers[level - 1].reshape(-1, descriptors.shape[1])[node][None],
+                                             b, axis=0)
+                centers[node] = node_centers
+                if level + 1 < self.depth:
+                    nearest = np.argmin(squared_distances(descriptors[index], node_centers), axis=1)
+                    children.extend(index[nearest == child] for child in range(b))
+            self.centers.append(centers)
+            members = children
+        return self
+
+    def predict(self, descriptors, chunk_size=65536):
+        # Leaf (visual word) of every descriptor, between 0 and n_words - 1. At each level the descriptors
+        # are grouped by their current node and compared with that node's b children in one matmul
+        if self.centers is None:
+            raise ValueError("The tree is not fitted, call fit first")
+        b = self.branching
+        # ||c||^2 of every child centre of every level
+        norms = [np.einsum('nbd,nbd->nb', centers, centers) for centers in self.centers]
+        words = np.empty(len(descriptors), dtype=np.int64)
+        for start in range(0, len(descriptors), chunk_size):
+            chunk = np.asarray(descriptors[start:start + chunk_size], dtype=np.float32)
+            node = np.zeros(len(chunk), dtype=np.int64)
+            for centers, center_norms in zip(self.centers, norms):
+                # Descriptors sorted by node, so each node's descriptors are one contiguous run
+                order = np.argsort(node, kind='stable')
+                nodes, first = np.unique(node[order], return_index=True)
+                bounds = np.append(first, len(order))
+                child = np.empty(len(chunk), dtype=np.int64)
+                for n, lo, hi in zip(nodes, bounds[:-1], bounds[1:]):
+                    index = order[lo:hi]
+                    # argmin ||c||^2 - 2 x.c over the node's children
+                    child[index] = np.argmin(center_norms[n] - 2 * (chunk[index] @ centers[n].T), axis=1)
+                node = node * b + child
+            words[start:start + chunk_size] = node
+        return words
+
+
+def squared_distances(x, centers):
+    # ||x - c||^2 of every row of x to every centre, (n, k)
+    return (np.einsum('ij,ij->i', x, x)[:, None] - 2 * (x @ centers.T)
+            + np.einsum('ij,ij->i', centers, centers)[None, :])
+
+
+class InvertedIndex:
+    # TF-IDF weighted inverted file over visual word histograms. The database is stored word by word
+    # (a CSC matrix, each column the posting list of one word), so a query only visits the postings
+    # of the words it contains. Scores are cosine similarities of the L2-normalised TF-IDF vectors.
+
+    def __init__(self):
+        self.idf = None
+        self.postings = None
+
+    def weight(self, histograms):
+        # TF-IDF vectors, L2-normalised, as a sparse matrix
+        histograms = sparse.csr_matrix(histograms, dtype=np.float64)
+        totals = np.asarray(histograms.sum(axis=1)).ravel()
+        tf = sparse.diags(1 / np.maximum(totals, 1)) @ histograms
+        weighted = (tf @ sparse.diags(self.idf)).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        return sparse.diags(1 / np.where(norms > 0, norms, 1)) @ weighted
+
+    def fit(self, histograms):
+        # histograms: (n_images, n_words) visual word counts of the database images
+        histograms = sparse.csr_matrix(histograms)
+        n_images = histograms.shape[0]
+        document_frequency = np.bincount(histograms.indices, minlength=histograms.shape[1])
+        # Words in no image get no weight
+        self.idf = np.where(document_frequency > 0, np.log(n_images / np.maximum(document_frequency, 1)), 0.0)
+        self.postings = self.weight(histograms).tocsc()
+        return self
+
+    def query(self, histograms, k=10):
+        # The k best database images for each query histogram, (indices, scores) sorted best first.
+        # A single histogram gives 1D arrays, a 2D batch of histograms gives (n_queries, k) arrays
+        single = np.ndim(histograms) == 1
+        queries = self.weight(np.atleast_2d(histograms))
+        # Only the postings of the query words are touched
+        scores = (queries @ self.postings.T).toarray()
+        k = min(k, scores.shape[1])
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        if single:
+            return best[0], best_scores[0]
+        return best, best_scores
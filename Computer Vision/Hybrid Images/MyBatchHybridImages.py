@@ -0,0 +1,149 @@
+import argparse
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import imageio
+import numpy as np
+
+from MyConvolution import convolve
+from MyHybridImages import makeGaussianKernel
+
+# Makes many hybrid images from a manifest, computing every Gaussian blur only once.
+# The manifest is a CSV file with one job per row and the columns
+#     low, high, low_sigma, high_sigma[, output]
+# (image paths relative to the manifest). Run with:
+#     python MyBatchHybridImages.py jobs.csv --output-dir results --cache-dir blur_cache
+
+# Kernels by sigma, each process builds a kernel only once
+kernelCache = {}
+
+
+def getKernel(sigma):
+    if sigma not in kernelCache:
+        kernelCache[sigma] = makeGaussianKernel(sigma)
+    return kernelCache[sigma]
+
+
+def loadImage(path):
+    image = imageio.imread(path)
+    # Dropping the alpha channel like test.py does
+    if image.ndim == 3:
+        image = image[:, :, 0:3]
+    return image
+
+
+def imageHash(image):
+    # Images with the same pixels share blurs, whatever their file names
+    h = hashlib.sha1()
+    h.update(str((image.shape, image.dtype.str)).encode())
+    h.update(np.ascontiguousarray(image).tobytes())
+    return h.hexdigest()
+
+
+class BlurCache:
+    # Blurred images by (image hash, sigma), kept in memory and, if a directory is given, as .npy files
+    # there, so worker processes and later runs reuse them
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.blurs = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, '%s_%r.npy' % key)
+
+    def get(self, image, sigma, key=None):
+        key = (key or imageHash(image), float(sigma))
+        if key in self.blurs:
+            return self.blurs[key]
+        if self.directory is not None and os.path.exists(self.path(key)):
+            blur = np.load(self.path(key))
+        else:
+            blur = convolve(image, getKernel(sigma))
+            if self.directory is not None:
+                # Writing to a temporary file first so other processes never read half a file
+                temp = self.path(key) + '.%d.tmp' % os.getpid()
+                with open(temp, 'wb') as f:
+                    np.save(f, blur)
+                os.replace(temp, self.path(key))
+        self.blurs[key] = blur
+        return blur
+
+
+def readManifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, newline='') as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            low = os.path.join(base, row['low'])
+            high = os.path.join(base, row['high'])
+            lowSigma = float(row['low_sigma'])
+            highSigma = float(row['high_sigma'])
+            output = row.get('output') or '%d_%s_%s_%g_%g.png' % (
+                i, os.path.splitext(os.path.basename(low))[0], os.path.splitext(os.path.basename(high))[0],
+                lowSigma, highSigma)
+            jobs.append((low, high, lowSigma, highSigma, output))
+    return jobs
+
+
+def blurTask(task):
+    # Worker: one blur of one image, stored in the cache directory
+    path, key, sigma, directory = task
+    BlurCache(directory).get(loadImage(path), sigma, key)
+
+
+def hybridTask(task):
+    # Worker: one hybrid image from blurs already in the cache directory
+    (low, high, lowSigma, highSigma, output), keys, directory, outputDir = task
+    cache = BlurCache(directory)
+    lowImage = loadImage(low)
+    highImage = loadImage(high)
+    # Same as myHybridImages, with the blurs taken from the cache
+    res = cache.get(lowImage, lowSigma, keys[low]) + (highImage - cache.get(highImage, highSigma, keys[high]))
+    out = (res - res.min())/(res.max() - res.min())*255
+    imageio.imwrite(os.path.join(outputDir, output), out.astype(np.uint8))
+    return output
+
+
+def runBatch(jobs, outputDir, cacheDir=None, workers=None):
+    # jobs is a list of (low image path, high image path, low sigma, high sigma, output file name)
+    os.makedirs(outputDir, exist_ok=True)
+    # Workers share blurs through the cache directory, a temporary one removed at the end (even if a job
+    # fails) if none is given
+    directory = cacheDir or tempfile.mkdtemp(prefix='blur_cache_')
+    try:
+        paths = sorted({job[0] for job in jobs} | {job[1] for job in jobs})
+        keys = {path: imageHash(loadImage(path)) for path in paths}
+        # Every distinct (image, sigma) blur, computed once even if many jobs (or two files) need it
+        blurs = {}
+        for low, high, lowSigma, highSigma, output in jobs:
+            blurs.setdefault((keys[low], float(lowSigma)), low)
+            blurs.setdefault((keys[high], float(highSigma)), high)
+        cache = BlurCache(directory)
+        blurTasks = [(path, key, sigma, directory) for (key, sigma), path in blurs.items()
+                     if not os.path.exists(cache.path((key, sigma)))]
+        print('%d jobs, %d distinct blurs, %d already cached'
+              % (len(jobs), len(blurs), len(blurs) - len(blurTasks)))
+        hybridTasks = [(job, keys, directory, outputDir) for job in jobs]
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(blurTask, blurTasks))
+            return list(pool.map(hybridTask, hybridTasks))
+    finally:
+        if cacheDir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Make the hybrid images listed in a manifest')
+    parser.add_argument('manifest', help='CSV file with columns low, high, low_sigma, high_sigma[, output]')
+    parser.add_argument('--output-dir', default='hybrid_images')
+    parser.add_argument('--cache-dir', default=None, help='Directory keeping blurred images between runs')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    outputs = runBatch(readManifest(args.manifest), args.output_dir, args.cache_dir, args.workers)
+    print('Saved %d hybrid images to %s' % (len(outputs), args.output_dir))
@@ -1,7 +1,240 @@
+import mmap
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Rough nanoseconds per unit of work of each method, used to pick the cheapest one:
+# a multiply-add for direct and separable, a complex butterfly (n log2 n per transform) for fft
+COST = {'direct': 1.0, 'separable': 1.5, 'fft': 1.5}
+
+
+def convolve(image, kernel, dtype=None, method='auto', tile_size=None, workers=None, out=None):
+    # method is 'direct', 'separable', 'fft' or 'auto', which picks the cheapest method with choose_method
+    if method not in ('auto', 'direct', 'separable', 'fft'):
+        raise ValueError("method must be 'auto', 'direct', 'separable' or 'fft'")
+    # Images on disk, or when tiles or an output file are asked for, go through the tiled version
+    if tile_size is not None or workers is not None or out is not None or isinstance(image, str):
+        return convolve_tiled(image, kernel, dtype, method, tile_size or 1024, workers, out)
+    image = np.asarray(image)
+    kernel = np.asarray(kernel)
+    factors = None
+    if method in ('auto', 'separable'):
+        factors = separate_kernel(kernel)
+        if factors is None and method == 'separable':
+            raise ValueError("Kernel is not separable")
+    if method == 'auto':
+        method = choose_method(image.shape, kernel.shape, factors is not None)
+    if method == 'separable':
+        return convolve_separable(image, factors[0], factors[1], dtype)
+    if method == 'fft':
+        return convolve_fft(image, kernel, dtype)
+    return convolve_direct(image, kernel, dtype)
+
+
+def choose_method(image_shape, kernel_shape, separable=False):
+    # Estimated cost of each method for this image and kernel, returning the cheapest
+    r, c = image_shape[:2]
+    channels = int(np.prod(image_shape[2:]))
+    kh, kw = kernel_shape
+    costs = {'direct': COST['direct'] * r * c * channels * kh * kw}
+    # A single row or column is already 1D, splitting it would only add a pass
+    if separable and kh > 1 and kw > 1:
+        costs['separable'] = COST['separable'] * r * c * channels * (kh + kw)
+    # One forward transform per channel, one for the kernel and one inverse per channel
+    n = fast_length(r + kh - 1) * fast_length(c + kw - 1)
+    costs['fft'] = COST['fft'] * (2 * channels + 1) * n * np.log2(max(n, 2))
+    return min(costs, key=costs.get)
+
+
+def fast_length(n):
+    # Smallest 2^a 3^b 5^c >= n, FFT lengths with only small prime factors are much faster
+    best = 1 << int(np.ceil(np.log2(max(n, 1))))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # Smallest power of two taking p35 up to at least n
+            length = p35 << max(0, int(np.ceil(np.log2(n / p35))))
+            best = min(best, length)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def separate_kernel(kernel, tol=1e-10):
+    # Returns (column, row) with kernel == np.outer(column, row) if the kernel has rank 1, otherwise None
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim != 2:
+        return None
+    u, s, vt = np.linalg.svd(kernel)
+    if s[0] == 0 or (len(s) > 1 and s[1] > tol * s[0]):
+        return None
+    # Splitting the largest singular value evenly between the two factors
+    return u[:, 0] * np.sqrt(s[0]), vt[0] * np.sqrt(s[0])
+
+
+def convolve_separable(image, column, row, dtype=None):
+    # Convolving with np.outer(column, row) as a horizontal pass followed by a vertical pass,
+    # k1 + k2 multiplications per pixel instead of k1 * k2.
+    # The zero padding of each pass is the zero padding of the 2D kernel, so the result is the same
+    column = np.asarray(column).reshape(1, -1)
+    row = np.asarray(row).reshape(1, -1)
+    result = convolve_direct(image, row, dtype)
+    # The vertical pass is a horizontal pass over the transposed image, which keeps the windows long
+    result = convolve_direct(result.swapaxes(0, 1), column, result.dtype).swapaxes(0, 1)
+    return np.ascontiguousarray(result)
+
+
+def convolve_fft(image, kernel, dtype=None):
+    # Convolving by multiplying Fourier transforms, with the same zero padding and output as convolve
+    image = np.asarray(image)
+    kernel = np.asarray(kernel)
+    if image.ndim not in (2, 3):
+        raise ValueError("Only 2D or 3D Convolution Possible")
+    dtype = np.dtype(np.float64 if dtype is None else dtype)
+    r, c = image.shape[:2]
+    kh, kw = kernel.shape
+    # Transforms padded with zeros to at least the full convolution size, so nothing wraps around
+    shape = (fast_length(r + kh - 1), fast_length(c + kw - 1))
+    image_f = np.fft.rfft2(image.astype(dtype, copy=False), s=shape, axes=(0, 1))
+    kernel_f = np.fft.rfft2(kernel.astype(dtype, copy=False), s=shape)
+    if image.ndim == 3:
+        kernel_f = kernel_f[:, :, np.newaxis]
+    full = np.fft.irfft2(image_f * kernel_f, s=shape, axes=(0, 1))
+    # Output pixel (0, 0) of convolve is centred on the kernel element at (pad_dim, pad_dim2) of the flipped kernel
+    y0 = kh - 1 - kh // 2
+    x0 = kw - 1 - kw // 2
+    return full[y0:y0 + r, x0:x0 + c].astype(dtype)
+
+
+def convolve_direct(image, kernel, dtype=None):
+    # In case the input is not an array, convert it to array
+    image = np.asarray(image)
+    kernel = np.asarray(kernel)
+    if image.ndim not in (2, 3):
+        raise ValueError("Only 2D or 3D Convolution Possible")
+    # Computing in float64 unless float32 is requested
+    dtype = np.dtype(np.float64 if dtype is None else dtype)
+    # Flipping the kernel so that we can then use it for multiplication later
+    kernel = np.flip(kernel).astype(dtype)
+    pad_dim = kernel.shape[0] // 2
+    pad_dim2 = kernel.shape[1] // 2
+    r, c = image.shape[:2]
+    # Adding zero padding to the rows and columns only (never to the channels)
+    padding = ((pad_dim, pad_dim), (pad_dim2, pad_dim2)) + ((0, 0),) * (image.ndim - 2)
+    padded_img = np.pad(image.astype(dtype, copy=False), padding, 'constant')
+    result = np.zeros(image.shape, dtype=dtype)
+    # Number of output rows done at once, so each block of windows stays around 4M values
+    block = max(1, (1 << 22) // (c * kernel.shape[1] * (image.size // (r * c))))
+    for i in range(kernel.shape[0]):
+        # View of every window of one kernel row across the padded image, shaped
+        # (rows, cols, [channels,] kernel cols) without copying any pixel
+        windows = sliding_window_view(padded_img[i:i + r], kernel.shape[1], axis=1)[:, :c]
+        for y in range(0, r, block):
+            # Multiplying each window by the kernel row and summing, for all pixels and channels at once
+            result[y:y + block] += windows[y:y + block] @ kernel[i]
+    return result
+
+
+def convolve_tiled(image, kernel, dtype=None, method='auto', tile_size=1024, workers=None, out=None):
+    # Convolving tile_size x tile_size tiles in a pool of worker processes. Each tile is read with a halo of
+    # half the kernel size, so the tiles give exactly the same result as convolving the whole image, and
+    # peak memory is about one tile (plus halo) per worker whatever the image size.
+    # image can be an array or the path of a .npy file, which is memory-mapped instead of loaded.
+    # out can be the path of a .npy file or a memory-mapped array to write the result to (returned as a
+    # memory map), otherwise the result is returned in memory
+    kernel = np.asarray(kernel)
+    dtype = np.dtype(np.float64 if dtype is None else dtype)
+    workers = workers or os.cpu_count() or 1
+    temp_dir = tempfile.mkdtemp()
+    try:
+        if isinstance(image, str):
+            image = np.load(image, mmap_mode='r')
+        if image.ndim not in (2, 3):
+            raise ValueError("Only 2D or 3D Convolution Possible")
+        # Worker processes open the input and output files themselves, in-memory arrays are spilled to disk first
+        if not is_mapped_file(image):
+            np.save(os.path.join(temp_dir, 'image.npy'), image)
+            image = np.load(os.path.join(temp_dir, 'image.npy'), mmap_mode='r')
+        if out is None:
+            result = np.lib.format.open_memmap(os.path.join(temp_dir, 'result.npy'), 'w+', dtype, image.shape)
+        elif isinstance(out, str):
+            result = np.lib.format.open_memmap(out, 'w+', dtype, image.shape)
+        elif is_mapped_file(out) and out.shape == image.shape and out.dtype == dtype:
+            result = out
+        else:
+            raise ValueError("out must be a .npy path or a memory-mapped array of the image shape and dtype")
+
+        r, c = image.shape[:2]
+        kh, kw = kernel.shape
+        # Choosing the method once, for a tile with its halo
+        if method in ('auto', 'separable'):
+            separable = separate_kernel(kernel) is not None
+            if not separable and method == 'separable':
+                raise ValueError("Kernel is not separable")
+            if method == 'auto':
+                tile_shape = (min(tile_size, r) + kh - 1, min(tile_size, c) + kw - 1) + image.shape[2:]
+                method = choose_method(tile_shape, kernel.shape, separable)
+
+        tiles = [(mapped_file(image), mapped_file(result), kernel, dtype, method,
+                  (y, min(y + tile_size, r), x, min(x + tile_size, c)))
+                 for y in range(0, r, tile_size) for x in range(0, c, tile_size)]
+        if workers == 1:
+            for tile in tiles:
+                convolve_tile(tile)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                # Consuming the results so errors in the workers are raised here
+                list(pool.map(convolve_tile, tiles))
+
+        if out is None:
+            return np.array(result)
+        result.flush()
+        return result
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def convolve_tile(task):
+    # Worker for convolve_tiled: convolving one tile with its halo and writing it into the output file
+    source, target, kernel, dtype, method, (y0, y1, x0, x1) = task
+    image = open_mapped_file(source, 'r')
+    r, c = image.shape[:2]
+    kh, kw = kernel.shape
+    # The halo is the rows and columns the kernel reaches past the tile edges (kernel.shape // 2 before,
+    # one less after for even sizes). At the image borders it is cut off, and convolve adds the zero padding
+    top = min(y0, kh // 2)
+    bottom = min(r - y1, kh - 1 - kh // 2)
+    left = min(x0, kw // 2)
+    right = min(c - x1, kw - 1 - kw // 2)
+    tile = convolve(image[y0 - top:y1 + bottom, x0 - left:x1 + right], kernel, dtype, method)
+    result = open_mapped_file(target, 'r+')
+    result[y0:y1, x0:x1] = tile[top:top + y1 - y0, left:left + x1 - x0]
+    result.flush()
+
+
+def is_mapped_file(array):
+    # True for a whole C-ordered memory-mapped file (not a view of part of one)
+    return isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous
+
+
+def mapped_file(array):
+    # What a worker process needs to map the same file again
+    return array.filename, array.offset, array.dtype, array.shape
+
+
+def open_mapped_file(description, mode):
+    filename, offset, dtype, shape = description
+    return np.memmap(filename, dtype=dtype, mode=mode, offset=offset, shape=shape)
 
 
-def convolve(image, kernel):
+def convolve_reference(image, kernel):
+    # Original per-pixel implementation, kept to check the vectorised version against
     # In case the input is not an array, convert it to array
     image = np.array(image)
     kernel = np.array(kernel)
@@ -37,4 +270,4 @@ def convolve(image, kernel):
     else:
         print("Only 2D or 3D Comvolution Possible")
 
-    return result
\ No newline at end of file
+    return result
@@ -5,6 +5,7 @@ from MyConvolution import convolve
 
 
 def myHybridImages(lowImage, lowSigma, highImage, highSigma):
+    # convolve picks two 1D passes or an FFT for the (separable) Gaussian kernels depending on their size
     low1 = convolve(lowImage, makeGaussianKernel(lowSigma))
     low2 = convolve(highImage, makeGaussianKernel(highSigma))
     high2 = highImage - low2
@@ -12,15 +13,17 @@ def myHybridImages(lowImage, lowSigma, highImage, highSigma):
     return res
 
 
-def makeGaussianKernel(sigma):
+def makeGaussianKernel1D(sigma):
     size = int(np.floor(8*sigma+1))
     if size % 2 == 0:
         size += 1
     centre = size//2
-    g = np.empty((size, size))
-    sum = 0
-    for i in range(0, size):
-        for j in range(0, size):
-            g[j][i] = np.exp(-(((j-centre)*(j-centre))+((i-centre)*(i-centre)))/(2*sigma*sigma))
-            sum = sum + g[j][i]
-    return np.array(g/sum)
\ No newline at end of file
+    x = np.arange(size) - centre
+    g = np.exp(-(x*x)/(2*sigma*sigma))
+    return g/g.sum()
+
+
+def makeGaussianKernel(sigma):
+    # The 2D Gaussian is the outer product of two 1D Gaussians (and stays normalised)
+    g = makeGaussianKernel1D(sigma)
+    return np.outer(g, g)
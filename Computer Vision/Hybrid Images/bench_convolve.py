@@ -0,0 +1,144 @@
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+from scipy import ndimage
+from scipy import signal
+
+from MyConvolution import convolve, convolve_reference, choose_method
+from MyHybridImages import makeGaussianKernel
+
+# Speed and correctness of every convolve method against scipy, over image size, channels, kernel size and dtype.
+# Every result is checked against the reference loop on small inputs and against scipy.signal.fftconvolve
+# (the same zero padding, computed in float64) on larger ones, and timed in milliseconds per megapixel.
+# Run with:
+#     python bench_convolve.py --quick
+#     python bench_convolve.py --sizes 256 1024 --kernels 9 73 --output bench.json
+
+METHODS = ['reference', 'direct', 'separable', 'fft', 'auto', 'tiled',
+           'ndimage.convolve', 'signal.convolve2d', 'signal.fftconvolve']
+
+GRID = {'sizes': [64, 256, 1024], 'channels': [1, 3], 'kernels': [3, 9, 25, 73], 'dtypes': ['float64', 'float32']}
+QUICK_GRID = {'sizes': [32, 128], 'channels': [1, 3], 'kernels': [3, 9, 25], 'dtypes': ['float64', 'float32']}
+
+# Allowed error relative to the largest output value
+TOLERANCE = {'float64': 1e-10, 'float32': 1e-4}
+
+
+def per_channel(function, image, kernel):
+    # scipy's 2D functions on each channel of an RGB image
+    if image.ndim == 2:
+        return function(image, kernel)
+    return np.stack([function(image[:, :, d], kernel) for d in range(image.shape[2])], axis=2)
+
+
+def run_method(method, image, kernel, dtype):
+    if method == 'reference':
+        return convolve_reference(image, kernel)
+    if method == 'tiled':
+        return convolve(image, kernel, dtype, tile_size=max(16, image.shape[0] // 2), workers=2)
+    if method == 'ndimage.convolve':
+        # Same centre as convolve for odd kernels, mode='constant' is the zero padding
+        image = image.astype(dtype)
+        return per_channel(lambda x, k: ndimage.convolve(x, k, mode='constant', cval=0.0), image, kernel.astype(dtype))
+    if method == 'signal.convolve2d':
+        image = image.astype(dtype)
+        return per_channel(lambda x, k: signal.convolve2d(x, k, mode='same'), image, kernel.astype(dtype))
+    if method == 'signal.fftconvolve':
+        image = image.astype(dtype)
+        return per_channel(lambda x, k: signal.fftconvolve(x, k, mode='same'), image, kernel.astype(dtype))
+    return convolve(image, kernel, dtype, method)
+
+
+def work(method, size, channels, kernel_size):
+    # Multiply-adds of the per-pixel methods, used to skip cases that would take minutes
+    pixels = size * size * channels
+    if method == 'reference':
+        return pixels * 2000
+    if method in ('direct', 'ndimage.convolve', 'signal.convolve2d'):
+        return pixels * kernel_size * kernel_size
+    return 0
+
+
+def run_case(size, channels, kernel_size, dtype, repeat, max_work):
+    rng = np.random.RandomState(0)
+    shape = (size, size) if channels == 1 else (size, size, channels)
+    image = rng.randint(0, 256, shape).astype(np.uint8)
+    kernel = makeGaussianKernel((kernel_size - 1) / 8)
+    assert kernel.shape == (kernel_size, kernel_size)
+
+    # The expected output: the reference loop when it is quick enough, scipy's float64 FFT otherwise
+    if work('reference', size, channels, kernel_size) <= max_work:
+        expected = convolve_reference(image, kernel)
+    else:
+        expected = per_channel(lambda x, k: signal.fftconvolve(x, k, mode='same'), image.astype(np.float64), kernel)
+    scale = max(np.abs(expected).max(), 1)
+
+    results = []
+    for method in METHODS:
+        if work(method, size, channels, kernel_size) > max_work:
+            continue
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run_method(method, image, kernel, dtype)
+            best = min(best, time.perf_counter() - start)
+        error = float(np.abs(result - expected).max() / scale)
+        # The reference loop always computes in float64
+        tolerance = TOLERANCE['float64' if method == 'reference' else dtype]
+        results.append({'size': size, 'channels': channels, 'kernel': kernel_size, 'dtype': dtype,
+                        'method': method, 'seconds': best, 'ms_per_megapixel': best * 1e3 / (size * size / 1e6),
+                        'error': error, 'ok': bool(result.shape == expected.shape and error <= tolerance)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and check the convolve methods against scipy')
+    parser.add_argument('--quick', action='store_true', help='Use a small grid')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Image sides in pixels')
+    parser.add_argument('--channels', type=int, nargs='+')
+    parser.add_argument('--kernels', type=int, nargs='+', help='Odd Gaussian kernel sides')
+    parser.add_argument('--dtypes', nargs='+', choices=['float64', 'float32'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-work', type=float, default=2e9,
+                        help='Skip per-pixel methods needing more multiply-adds than this')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    grid = dict(QUICK_GRID if args.quick else GRID)
+    for name in grid:
+        if getattr(args, name) is not None:
+            grid[name] = getattr(args, name)
+    if any(k % 2 == 0 for k in grid['kernels']):
+        parser.error('kernel sizes must be odd (scipy.ndimage centres even kernels differently)')
+
+    results = []
+    failures = 0
+    for size, channels, kernel_size, dtype in itertools.product(grid['sizes'], grid['channels'],
+                                                                grid['kernels'], grid['dtypes']):
+        auto = choose_method((size, size, channels), (kernel_size, kernel_size), True)
+        print('%dx%d x %d channels, %dx%d kernel, %s (auto picks %s)'
+              % (size, size, channels, kernel_size, kernel_size, dtype, auto))
+        case = run_case(size, channels, kernel_size, dtype, args.repeat, args.max_work)
+        for result in case:
+            failures += not result['ok']
+            print('    %-20s %10.2f ms/MP   error %.1e%s' % (result['method'], result['ms_per_megapixel'],
+                                                         result['error'], '' if result['ok'] else '   FAIL'))
+        results.extend(case)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'grid': grid, 'results': results}, f, indent=2)
+        print('Saved %d measurements to %s' % (len(results), args.output))
+
+    if failures:
+        print('%d results do not match' % failures)
+        sys.exit(1)
+    print('All results match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import sys
+import numpy as np
+
+from MyConvolution import convolve, convolve_reference, choose_method
+
+# Compares every convolve method against the original per-pixel loop on small random inputs
+# Run with: python check_convolve.py
+
+rng = np.random.RandomState(0)
+
+shapes = [(1, 1), (5, 4), (17, 23), (12, 9, 3), (8, 11, 4)]
+kernel_shapes = [(1, 1), (3, 3), (1, 5), (4, 1), (5, 3), (4, 6), (9, 9), (21, 13)]
+failures = 0
+
+for shape in shapes:
+    for kernel_shape in kernel_shapes:
+        for image_dtype in (np.uint8, np.float64):
+            image = (rng.rand(*shape) * 255).astype(image_dtype)
+            # One general kernel and one separable kernel of each shape
+            kernels = [rng.randn(*kernel_shape),
+                       np.outer(rng.randn(kernel_shape[0]), rng.randn(kernel_shape[1]))]
+            for k, kernel in enumerate(kernels):
+                expected = convolve_reference(image, kernel)
+                scale = max(np.abs(expected).max(), 1)
+                methods = ['auto', 'direct', 'fft'] + (['separable'] if k == 1 else [])
+                for method in methods:
+                    for dtype, tol in ((np.float64, 1e-10), (np.float32, 1e-4)):
+                        result = convolve(image, kernel, dtype=dtype, method=method)
+                        error = np.abs(result - expected).max() / scale
+                        if result.shape != expected.shape or result.dtype != dtype or error > tol:
+                            failures += 1
+                            print("FAIL %-9s image %-12s %-7s kernel %-8s %-7s relative error %.2e"
+                                  % (method, shape, np.dtype(image_dtype).name, kernel_shape,
+                                     np.dtype(dtype).name, error))
+
+# Tiles smaller than the kernel, uneven tiles and tiles larger than the image, in worker processes
+image = rng.rand(45, 38, 3)
+for kernel_shape in [(3, 3), (4, 6), (15, 15)]:
+    kernel = rng.randn(*kernel_shape)
+    expected = convolve_reference(image, kernel)
+    for tile_size in (5, 16, 64):
+        result = convolve(image, kernel, tile_size=tile_size, workers=2)
+        error = np.abs(result - expected).max() / max(np.abs(expected).max(), 1)
+        if result.shape != expected.shape or error > 1e-10:
+            failures += 1
+            print("FAIL tiled (tile %d) kernel %-8s relative error %.2e" % (tile_size, kernel_shape, error))
+
+# The methods picked for the kernels used in myHybridImages
+for size in (64, 512, 2048):
+    for sigma in (1, 3, 9):
+        k = int(np.floor(8 * sigma + 1)) | 1
+        print("%4dx%-4d RGB, sigma %d (%2dx%-2d kernel): %s"
+              % (size, size, sigma, k, k, choose_method((size, size, 3), (k, k), separable=True)))
+
+if failures:
+    print("%d checks failed" % failures)
+    sys.exit(1)
+print("All methods match the reference loop")
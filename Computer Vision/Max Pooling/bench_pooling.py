@@ -0,0 +1,79 @@
+import argparse
+import time
+
+import numpy as np
+
+from pooling import max_pool
+
+# Timing of the vectorised max pooling against the list version from 2D Max Pooling.ipynb.
+# Run with:
+#     python bench_pooling.py --sizes 64 256 1024 --batch 32 --channels 16
+
+
+def max_pooling(matrix, size=2):
+    # The notebook version, unchanged: one 2D matrix, window == stride. It only looks at the first
+    # row of each window, so its results are not compared, only its speed
+    w = -(-(len(matrix)-size+1)//size)
+    h = -(-(len(matrix[0])-size+1)//size)
+    mat_res = [[0 for x in range(w)] for y in range(h)]
+    r2 = 0
+    for r in [i for i in range(0, len(matrix), size)]:
+        c2 = 0
+        for c in [i for i in range(0, len(matrix[0]), size)]:
+            res1 = matrix[r:r+size][0][c:c+size]
+            res2 = matrix[r:r+size][1][c:c+size]
+            mat_res[r2][c2] = max(sum([res1], []))
+            c2 = c2 + 1
+        r2 = r2 + 1
+    return mat_res
+
+
+def max_pooling_loop(matrix, size=2):
+    # Correct per-window loop over one 2D matrix, to check the vectorised results against
+    matrix = np.asarray(matrix)
+    h, w = matrix.shape[0] // size, matrix.shape[1] // size
+    return np.array([[matrix[r*size:(r+1)*size, c*size:(c+1)*size].max() for c in range(w)] for r in range(h)])
+
+
+def best_time(function, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark max pooling against the notebook list version')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('--window', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--channels', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    for size in args.sizes:
+        matrix = rng.rand(size, size)
+        as_list = matrix.tolist()
+        x = rng.rand(args.batch, args.channels, size, size).astype(np.float32)
+
+        expected = max_pooling_loop(matrix, args.window)
+        result = max_pool(matrix[np.newaxis, np.newaxis], args.window)[0, 0]
+        assert np.array_equal(result, expected), 'vectorised result does not match the loop'
+
+        # One matrix through the list version, a whole batch through the vectorised one
+        list_time = best_time(lambda: max_pooling(as_list, args.window), args.repeat)
+        single_time = best_time(lambda: max_pool(matrix[np.newaxis, np.newaxis], args.window), args.repeat)
+        batch_time = best_time(lambda: max_pool(x, args.window), args.repeat)
+        index_time = best_time(lambda: max_pool(x, args.window, return_indices=True), args.repeat)
+        planes = args.batch * args.channels
+        print('%5dx%-5d list %9.3f ms/plane   vectorised %8.3f ms/plane (%6.0fx)   batch of %d: %8.3f ms/plane,'
+              ' with indices %8.3f ms/plane'
+              % (size, size, list_time * 1e3, single_time * 1e3, list_time / single_time, planes,
+                 batch_time * 1e3 / planes, index_time * 1e3 / planes))
+
+
+if __name__ == '__main__':
+    main()
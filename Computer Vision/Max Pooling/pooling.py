@@ -0,0 +1,120 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Max, average and L2 pooling over batched arrays shaped (N, C, *spatial), e.g. NCHW images, with any
+# number of spatial dimensions and any window, stride and padding. Windows are strided views of the
+# input, so no window is ever copied (padding, avg of integers and l2 make one copy of the input).
+#
+#     out = max_pool(x, 2)                                  # 2x2 windows, stride 2
+#     out, indices = max_pool(x, 3, stride=2, padding=1, return_indices=True)
+#     grad_x = max_pool_backward(grad_out, indices, x.shape)
+
+
+def as_tuple(value, n, name):
+    # An int for every spatial dimension, or one int per dimension
+    values = (value,) * n if np.isscalar(value) else tuple(value)
+    if len(values) != n:
+        raise ValueError("%s needs %d values, one per spatial dimension" % (name, n))
+    return tuple(int(v) for v in values)
+
+
+def output_shape(input_shape, window, stride, padding):
+    # Spatial size of the output, windows that do not fit in the (padded) input are dropped
+    shape = tuple((size + 2 * p - w) // s + 1 for size, w, s, p in zip(input_shape, window, stride, padding))
+    if min(shape) < 1:
+        raise ValueError("Window %s is larger than the padded input %s" % (window, input_shape))
+    return shape
+
+
+def window_view(x, window, stride):
+    # View of x shaped (N, C, *output, *window) where view[n, c, i, j, ..., a, b, ...] is
+    # x[n, c, i * stride[0] + a, j * stride[1] + b, ...]
+    spatial = x.shape[2:]
+    out = output_shape(spatial, window, stride, (0,) * len(spatial))
+    strides = x.strides[:2] + tuple(st * s for st, s in zip(x.strides[2:], stride)) + x.strides[2:]
+    return as_strided(x, x.shape[:2] + out + window, strides, writeable=False)
+
+
+def pool(x, window, stride=None, padding=0, mode='max', return_indices=False):
+    # mode is 'max', 'avg' (padding counts as zeros) or 'l2' (square root of the sum of squares).
+    # stride defaults to the window size. With return_indices, max pooling also returns the flat
+    # index of each maximum in its (unpadded) input plane, as used by max_pool_backward
+    x = np.asarray(x)
+    if x.ndim < 3:
+        raise ValueError("Input must be shaped (N, C, *spatial)")
+    if mode not in ('max', 'avg', 'l2'):
+        raise ValueError("mode must be 'max', 'avg' or 'l2'")
+    if return_indices and mode != 'max':
+        raise ValueError("Indices are only returned for max pooling")
+    n = x.ndim - 2
+    window = as_tuple(window, n, 'window')
+    stride = window if stride is None else as_tuple(stride, n, 'stride')
+    padding = as_tuple(padding, n, 'padding')
+    if any(2 * p > w for p, w in zip(padding, window)):
+        raise ValueError("Padding must be at most half the window")
+
+    if mode == 'l2':
+        # Squaring once, before taking windows, so overlapping windows do not square pixels again
+        x = np.square(x, dtype=np.result_type(x, np.float32))
+    elif mode == 'avg':
+        x = x.astype(np.result_type(x, np.float32), copy=False)
+    if any(padding):
+        # Padding with the identity of the reduction, so padded pixels never win or add anything
+        fill = (-np.inf if x.dtype.kind == 'f' else np.iinfo(x.dtype).min) if mode == 'max' else 0
+        x = np.pad(x, ((0, 0), (0, 0)) + tuple((p, p) for p in padding), 'constant', constant_values=fill)
+
+    windows = window_view(x, window, stride)
+    # Reducing one window offset at a time: each step is a strided (N, C, *output) view combined in place
+    # into the output, much faster than reducing the small trailing window axes of the view
+    positions = list(np.ndindex(*window))
+    out = windows[(Ellipsis,) + positions[0]].copy()
+    if mode in ('avg', 'l2'):
+        for position in positions[1:]:
+            np.add(out, windows[(Ellipsis,) + position], out=out)
+        return out / len(positions) if mode == 'avg' else np.sqrt(out, out=out)
+
+    if not return_indices:
+        for position in positions[1:]:
+            np.maximum(out, windows[(Ellipsis,) + position], out=out)
+        return out
+
+    # Flat index in the unpadded input plane of every window offset, relative to the window's corner
+    plane = tuple(size - 2 * p for size, p in zip(x.shape[2:], padding))
+    plane_strides = np.cumprod((1,) + plane[:0:-1])[::-1]
+    deltas = [int(np.dot(np.subtract(position, padding), plane_strides)) for position in positions]
+    # Keeping the index of the first maximum of each window along with it
+    indices = np.full(out.shape, deltas[0], dtype=np.int64)
+    for position, delta in zip(positions[1:], deltas[1:]):
+        candidate = windows[(Ellipsis,) + position]
+        np.copyto(indices, delta, where=candidate > out)
+        np.maximum(out, candidate, out=out)
+    # Adding the flat index of each window's corner
+    for axis, (s, plane_stride) in enumerate(zip(stride, plane_strides)):
+        corner = np.arange(out.shape[2 + axis]) * (s * plane_stride)
+        indices += corner.reshape((-1,) + (1,) * (n - 1 - axis))
+    return out, indices
+
+
+def max_pool(x, window, stride=None, padding=0, return_indices=False):
+    return pool(x, window, stride, padding, 'max', return_indices)
+
+
+def avg_pool(x, window, stride=None, padding=0):
+    return pool(x, window, stride, padding, 'avg')
+
+
+def l2_pool(x, window, stride=None, padding=0):
+    return pool(x, window, stride, padding, 'l2')
+
+
+def max_pool_backward(grad_out, indices, input_shape):
+    # Gradient of max pooling with respect to its input: every output gradient goes to the input
+    # pixel its maximum came from (summed where overlapping windows share a maximum)
+    grad_out = np.asarray(grad_out)
+    planes = int(np.prod(input_shape[:2]))
+    plane_size = int(np.prod(input_shape[2:]))
+    # Flat index in the whole input, plane by plane
+    flat = (np.arange(planes).reshape(input_shape[:2] + (1,) * (len(input_shape) - 2)) * plane_size
+            + indices).ravel()
+    grad = np.bincount(flat, weights=grad_out.ravel(), minlength=planes * plane_size)
+    return grad.reshape(input_shape).astype(grad_out.dtype, copy=False)
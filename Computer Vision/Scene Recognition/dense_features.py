@@ -0,0 +1,126 @@
+import hashlib
+import os
+from itertools import islice
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Dense patches and Gaussian pyramids for the Scene Recognition notebooks, without the per-patch copies
+# of get_patches and without rebuilding the pyramid of an image every time it is used:
+#
+#     patches = normalized_patches(img, window=4, step=2)     # same as unit_len(zero_mean(...)) on get_patches
+#     cache = PyramidCache('pyramid_cache')
+#     features = [pyramid_sift(img, step_size=5, cache=cache) for img in x_train]
+
+
+def patch_grid(size, window, step):
+    # Top-left corners along one axis: every step pixels, plus the last position so the image edge is
+    # covered (the grid of get_patches)
+    grid = list(range(0, size - window, step))
+    return np.array(grid + [size - window])
+
+
+def patch_view(img, window=8, step=4):
+    # Every window x window patch on a regular grid of step pixels, as a (rows, cols, window, window)
+    # strided view of img: nothing is copied. Unlike get_patches, the grid stops at the last multiple
+    # of step instead of adding a patch at the image edge
+    return sliding_window_view(img, (window, window))[::step, ::step]
+
+
+def get_patches(img, window=8, step=4, dtype=None, out=None):
+    # Same patches, in the same order, as get_patches from the notebooks: (n_patches, window * window).
+    # The output (of img's dtype unless another is given, or out) is the only copy, filled one grid row at a time
+    windows = sliding_window_view(img, (window, window))
+    gridy = patch_grid(img.shape[0], window, step)
+    gridx = patch_grid(img.shape[1], window, step)
+    if out is None:
+        out = np.empty((len(gridy) * len(gridx), window * window), dtype=dtype or img.dtype)
+    patches = out.reshape(len(gridy), len(gridx), window, window)
+    for i, y in enumerate(gridy):
+        patches[i] = windows[y, gridx]
+    return out
+
+
+def normalized_patches(img, window=8, step=4, dtype=np.float64, out=None):
+    # get_patches followed by sklearn's scale (zero mean and unit variance of every pixel position over
+    # the patches) and normalize (unit L2 length of every patch), computed in place in one output array
+    patches = get_patches(img, window, step, dtype, out)
+    patches -= patches.mean(axis=0)
+    std = patches.std(axis=0)
+    # Constant pixel positions are left at zero, as scale does
+    patches /= np.where(std > 0, std, 1)
+    norms = np.sqrt(np.einsum('ij,ij->i', patches, patches))
+    patches /= np.where(norms > 0, norms, 1)[:, np.newaxis]
+    return patches
+
+
+def image_hash(img):
+    # Images with the same pixels share cache entries, whatever their file names
+    h = hashlib.sha1()
+    h.update(str((img.shape, img.dtype.str)).encode())
+    h.update(np.ascontiguousarray(img).tobytes())
+    return h.hexdigest()
+
+
+class PyramidCache:
+    # Levels of Gaussian pyramids stored as .npy files named by image hash, downscale and level, and
+    # loaded memory-mapped. A pyramid is built once per image, later uses read it back from disk
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, downscale, level):
+        return os.path.join(self.directory, '%s_%g_%d.npy' % (key, downscale, level))
+
+    def levels(self, img, n_levels=4, downscale=1.2, key=None):
+        key = key or image_hash(img)
+        paths = [self.path(key, downscale, level) for level in range(n_levels)]
+        if not all(os.path.exists(path) for path in paths):
+            for path, level in zip(paths, gaussian_pyramid(img, n_levels, downscale)):
+                if not os.path.exists(path):
+                    # Writing to a temporary file first so a reader never sees half a level
+                    temp = path + '.%d.tmp' % os.getpid()
+                    with open(temp, 'wb') as f:
+                        np.save(f, level)
+                    os.replace(temp, path)
+        return [np.load(path, mmap_mode='r') for path in paths]
+
+
+def gaussian_pyramid(img, n_levels=4, downscale=1.2):
+    # The first n_levels levels of skimage's pyramid_gaussian (only those are computed)
+    from skimage.transform import pyramid_gaussian
+    return list(islice(pyramid_gaussian(img, downscale=downscale), n_levels))
+
+
+def pyramid_levels(img, n_levels=4, downscale=1.2, cache=None):
+    if cache is None:
+        return gaussian_pyramid(img, n_levels, downscale)
+    return cache.levels(img, n_levels, downscale)
+
+
+def multiscale_patches(img, window=8, step=4, n_levels=4, downscale=1.2, cache=None):
+    # Normalized dense patches of every pyramid level, stacked into one preallocated array
+    levels = pyramid_levels(img, n_levels, downscale, cache)
+    counts = [len(patch_grid(level.shape[0], window, step)) * len(patch_grid(level.shape[1], window, step))
+              for level in levels]
+    out = np.empty((sum(counts), window * window))
+    start = 0
+    for level, count in zip(levels, counts):
+        normalized_patches(np.asarray(level), window, step, out=out[start:start + count])
+        start += count
+    return out
+
+
+def pyramid_sift(img, step_size=5, n_levels=4, downscale=1.2, cache=None):
+    # Dense SIFT on the first pyramid levels, as pyramids() in GaussianPyramids.ipynb
+    import cv2
+    sift = cv2.SIFT_create() if hasattr(cv2, 'SIFT_create') else cv2.xfeatures2d.SIFT_create()
+    descriptors = []
+    for level in pyramid_levels(img, n_levels, downscale, cache):
+        image8bit = cv2.normalize(np.asarray(level), None, 0, 255, cv2.NORM_MINMAX).astype('uint8')
+        kp = [cv2.KeyPoint(x, y, step_size) for y in range(0, image8bit.shape[0], step_size)
+              for x in range(0, image8bit.shape[1], step_size)]
+        kps, descs = sift.compute(image8bit, kp)
+        descriptors.append(descs)
+    return np.vstack(descriptors)
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from dense_features import image_hash, normalized_patches, pyramid_sift
+
+# Content-addressed cache of extracted features (VGG embeddings, SIFT descriptors, dense patches) for the
+# Scene Recognition notebooks. An entry is keyed by the hash of the image pixels plus the extractor name
+# and configuration, stored as a .npy file (loaded memory-mapped) and recorded in manifest.jsonl, so a
+# rerun loads what was already extracted and only computes what is missing:
+#
+#     cache = FeatureCache('feature_cache')
+#     patches_train = cache.extract(x_train, 'patches', {'window': 4, 'step': 2})
+#     sift_train = cache.extract(x_train, 'pyramid_sift', {'step_size': 5})
+#     vgg_train = cache.extract(x_train, 'vgg16', {'input_size': 224})
+
+
+def extract_patches(images, window=8, step=4):
+    return [normalized_patches(img, window, step) for img in images]
+
+
+def extract_pyramid_sift(images, step_size=5, n_levels=4, downscale=1.2):
+    return [pyramid_sift(img, step_size, n_levels, downscale) for img in images]
+
+
+def extract_sift(images):
+    # Keypoint SIFT descriptors, (n, 128) per image (empty when no keypoint is found)
+    import cv2
+    sift = cv2.SIFT_create() if hasattr(cv2, 'SIFT_create') else cv2.xfeatures2d.SIFT_create()
+    features = []
+    for img in images:
+        keypoints, descriptors = sift.detectAndCompute(img, None)
+        features.append(np.empty((0, 128), dtype=np.float32) if descriptors is None else descriptors)
+    return features
+
+
+def extract_vgg16(images, input_size=224, batch_size=32):
+    # Bottleneck features of VGG16 (ImageNet weights, no classifier) as used in VVG_Extraction_Setup.ipynb
+    import cv2
+    from keras.applications.vgg16 import VGG16, preprocess_input
+    model = VGG16(include_top=False, weights='imagenet', input_shape=(input_size, input_size, 3))
+    features = []
+    for start in range(0, len(images), batch_size):
+        batch = []
+        for img in images[start:start + batch_size]:
+            img = cv2.resize(np.asarray(img), (input_size, input_size), interpolation=cv2.INTER_AREA)
+            # Grayscale scenes are repeated over the three channels VGG expects
+            batch.append(np.repeat(img[:, :, np.newaxis], 3, axis=2) if img.ndim == 2 else img)
+        features.extend(model.predict(preprocess_input(np.array(batch, dtype=np.float32)), verbose=0))
+    return features
+
+
+# Extractors by name: each takes a list of images and the configuration as keyword arguments and
+# returns one array per image
+EXTRACTORS = {
+    'patches': extract_patches,
+    'pyramid_sift': extract_pyramid_sift,
+    'sift': extract_sift,
+    'vgg16': extract_vgg16,
+}
+
+
+class FeatureCache:
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, 'manifest.jsonl')
+        # Entries by key, as recorded in the manifest
+        self.entries = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+
+    @staticmethod
+    def key(image_key, extractor, config):
+        # The same pixels through the same extractor and configuration always give the same key
+        description = json.dumps({'image': image_key, 'extractor': extractor, 'config': config}, sort_keys=True)
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def path(self, key):
+        # Two-character subdirectories keep directory listings short for large datasets
+        return os.path.join(self.directory, key[:2], key + '.npy')
+
+    def __contains__(self, key):
+        return key in self.entries and os.path.exists(self.path(key))
+
+    def load(self, key):
+        return np.load(self.path(key), mmap_mode='r')
+
+    def store(self, key, features, image_key, extractor, config):
+        features = np.asarray(features)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Writing to a temporary file first so an interrupted run never leaves half an entry
+        temp = path + '.%d.tmp' % os.getpid()
+        with open(temp, 'wb') as f:
+            np.save(f, features)
+        os.replace(temp, path)
+        entry = {'key': key, 'image': image_key, 'extractor': extractor, 'config': config,
+                 'shape': list(features.shape), 'dtype': features.dtype.str, 'created': time.time()}
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+        self.entries[key] = entry
+
+    def extract(self, images, extractor, config=None, compute=None, batch_size=64):
+        # Features of every image, loaded memory-mapped from the cache or computed (in batches, only for
+        # the images not cached yet) and stored. compute replaces the registered extractor of that name
+        config = dict(config or {})
+        compute = compute or EXTRACTORS[extractor]
+        image_keys = [image_hash(np.asarray(img)) for img in images]
+        keys = [self.key(image_key, extractor, config) for image_key in image_keys]
+        # First image of every missing key, so identical images in the list are computed once
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in self and key not in missing:
+                missing[key] = i
+        missing = list(missing.values())
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for i, features in zip(batch, compute([images[i] for i in batch], **config)):
+                self.store(keys[i], features, image_keys[i], extractor, config)
+        return [self.load(key) for key in keys]
@@ -0,0 +1,97 @@
+import argparse
+import time
+
+import numpy as np
+
+from neural_network import NeuralNetwork
+
+# Training throughput (examples per second) of the NeuralNetwork engine against the full-batch gradient
+# descent of nn_model in Artificial Neural Network.ipynb, on the notebook's two Gaussian blobs.
+# Run with:
+#     python bench_nn.py --examples 200 10000 100000 --hidden 7 64
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def notebook_step(parameters, X, Y, learning_rate=1.2):
+    # forward_propagation, compute_cost, backward_propagation and update_parameters of the notebook,
+    # unchanged apart from being inlined: new arrays and a new dictionary on every iteration
+    W1, b1, W2, b2 = parameters['W1'], parameters['b1'], parameters['W2'], parameters['b2']
+    m = X.shape[1]
+    Z1 = np.dot(W1, X) + b1
+    A1 = np.tanh(Z1)
+    Z2 = np.dot(W2, A1) + b2
+    A2 = sigmoid(Z2)
+    logprobs = np.multiply(np.log(A2), Y) + np.multiply((1 - Y), np.log(1 - A2))
+    cost = np.squeeze(- np.sum(logprobs) / m)
+    dZ2 = A2 - Y
+    dW2 = (1 / m) * np.dot(dZ2, A1.T)
+    db2 = (1 / m) * np.sum(dZ2, axis=1, keepdims=True)
+    dZ1 = np.multiply(np.dot(W2.T, dZ2), 1 - np.power(A1, 2))
+    dW1 = (1 / m) * np.dot(dZ1, X.T)
+    db1 = (1 / m) * np.sum(dZ1, axis=1, keepdims=True)
+    parameters = {"W1": W1 - learning_rate * dW1,
+                  "b1": b1 - learning_rate * db1,
+                  "W2": W2 - learning_rate * dW2,
+                  "b2": b2 - learning_rate * db2}
+    return parameters, cost
+
+
+def blobs(m, rng):
+    # The dataset of the notebook: two overlapping Gaussian blobs, as X (2, m) and y (1, m)
+    half = m // 2
+    X = np.vstack([np.concatenate([rng.normal(2, 2, half), rng.normal(4, 2, m - half)]),
+                   np.concatenate([rng.normal(1, 3, half), rng.normal(2, 3, m - half)])])
+    y = np.repeat([0.0, 1.0], [half, m - half]).reshape(1, m)
+    return X, y
+
+
+def throughput(function, examples, min_time=0.5):
+    # Examples per second of function (processing examples per call), repeated for at least min_time
+    function()
+    calls, start = 0, time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls * examples / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the training engine against nn_model')
+    parser.add_argument('--examples', type=int, nargs='+', default=[200, 10000, 100000])
+    parser.add_argument('--hidden', type=int, nargs='+', default=[7, 64])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--min-time', type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    for m in args.examples:
+        X, y = blobs(m, rng)
+        for n_h in args.hidden:
+            initial = NeuralNetwork([2, n_h, 1], weight_scale=0.01, dtype=np.float64)
+            state = {'parameters': initial.parameters()}
+
+            def notebook_iteration():
+                state['parameters'], _ = notebook_step(state['parameters'], X, y)
+
+            notebook = throughput(notebook_iteration, m, args.min_time)
+            results = []
+            for dtype, batch_size in ((np.float64, m), (np.float32, m), (np.float32, args.batch_size)):
+                network = NeuralNetwork([2, n_h, 1], weight_scale=0.01, dtype=dtype)
+                # Several epochs per fit call, as training runs, so the per-call setup is not what is timed
+                epochs = max(1, 100000 // m)
+                rate = throughput(lambda: network.fit(X, y, epochs=epochs, batch_size=batch_size),
+                                  epochs * m, args.min_time)
+                results.append(rate)
+            print('m=%-7d n_h=%-4d notebook %10.0f ex/s   engine full batch float64 %10.0f ex/s'
+                  ' (%4.1fx)   float32 %10.0f ex/s (%4.1fx)   batches of %d float32 %10.0f ex/s (%4.1fx)'
+                  % (m, n_h, notebook, results[0], results[0] / notebook, results[1], results[1] / notebook,
+                     args.batch_size, results[2], results[2] / notebook))
+
+
+if __name__ == '__main__':
+    main()
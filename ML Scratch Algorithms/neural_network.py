@@ -0,0 +1,299 @@
+import numpy as np
+
+# Training engine for the network of Artificial Neural Network.ipynb (tanh hidden layers, sigmoid output,
+# cross-entropy loss) with any number of hidden layers, trained full-batch or on mini-batches. Data keeps the
+# notebook layout, X (n_x, m) and Y (n_y, m):
+#
+#     network = NeuralNetwork([2, 7, 7, 1])
+#     history = network.fit(X, y, epochs=200, learning_rate=1.2, validation=(X_val, y_val),
+#                           callbacks=[EarlyStopping(patience=10)])
+#     predictions = network.predict(X_test)
+#     parameters = network.parameters()     # W1, b1, W2, b2... as in the notebook, for predict(parameters, X)
+#
+# Every array used by a training step (the batch, the activations and gradients of every layer) is
+# allocated once in the network's dtype (float32 by default) and reused in place, so a step allocates
+# nothing. Internally examples are rows, so the last, smaller batch of an epoch is the first rows of the
+# buffers and stays contiguous.
+#
+# fit trains full-batch by default, as the notebook does. In bench_nn.py (2 inputs, one hidden layer) that is
+# 1.5-4x the notebook's examples per second in float32, and 0.9-2x in float64 (the notebook's dtype, slowest
+# on 200 examples). Mini-batches (batch_size=64, say) make one update per batch, so every step pays numpy's
+# per-call overhead for few examples: 1-3x the notebook with 64 hidden units, but 0.2-0.4x with 7, where the
+# arithmetic per example is tiny. They need fewer epochs to converge on large datasets, which is what they
+# are for, not a higher throughput.
+
+
+def cross_entropy_sum(output, y, scratch):
+    # Summed cross-entropy of the outputs, using scratch (same shape) as work space:
+    # y log(a) + (1 - y) log(1 - a) summed as y.log(a) + sum(log(1 - a)) - y.log(1 - a)
+    eps = np.finfo(scratch.dtype).tiny
+    np.maximum(output, eps, out=scratch)
+    np.log(scratch, out=scratch)
+    total = np.vdot(scratch, y)
+    np.subtract(1, output, out=scratch)
+    np.maximum(scratch, eps, out=scratch)
+    np.log(scratch, out=scratch)
+    total += scratch.sum(dtype=np.float64) - np.vdot(scratch, y)
+    return -float(total)
+
+
+def count_correct(output, y, predicted, truth):
+    # Outputs on the right side of 0.5, predicted and truth being boolean work arrays of the same shape
+    np.greater(output, 0.5, out=predicted)
+    np.greater(y, 0.5, out=truth)
+    np.equal(predicted, truth, out=predicted)
+    return np.count_nonzero(predicted)
+
+
+class NeuralNetwork:
+
+    def __init__(self, layer_sizes, weight_scale=None, dtype=np.float32, random_state=None):
+        # layer_sizes: [n_x, hidden sizes..., n_y]. Weights are drawn from a normal distribution scaled
+        # by weight_scale (0.01 in the notebook), by default 1 / sqrt(fan in) so deep networks still train
+        if len(layer_sizes) < 2:
+            raise ValueError("layer_sizes needs at least the input and output sizes")
+        self.layer_sizes = list(layer_sizes)
+        self.dtype = np.dtype(dtype)
+        self.rng = np.random.RandomState(random_state)
+        self.weights = []
+        self.biases = []
+        for fan_in, fan_out in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            scale = weight_scale if weight_scale is not None else 1 / np.sqrt(fan_in)
+            self.weights.append((self.rng.randn(fan_out, fan_in) * scale).astype(self.dtype))
+            self.biases.append(np.zeros(fan_out, dtype=self.dtype))
+        self.batch_size = 0
+        self.views = {}
+        self.stop_training = False
+
+    def allocate(self, batch_size):
+        # Work buffers for batches of up to batch_size examples, (batch, layer size) each
+        if batch_size <= self.batch_size:
+            return
+        self.batch_size = batch_size
+        sizes = self.layer_sizes
+        self.x = np.empty((batch_size, sizes[0]), dtype=self.dtype)
+        self.y = np.empty((batch_size, sizes[-1]), dtype=self.dtype)
+        # Activations of every layer (the input batch first) and the gradients of the loss with respect
+        # to the pre-activations and activations of every layer
+        self.activations = [self.x] + [np.empty((batch_size, n), dtype=self.dtype) for n in sizes[1:]]
+        self.delta = [np.empty((batch_size, n), dtype=self.dtype) for n in sizes[1:]]
+        self.grad_activations = [np.empty((batch_size, n), dtype=self.dtype) for n in sizes[1:-1]]
+        self.grad_weights = [np.empty_like(w) for w in self.weights]
+        self.grad_biases = [np.empty_like(b) for b in self.biases]
+        self.predicted = np.empty((batch_size, sizes[-1]), dtype=bool)
+        self.truth = np.empty((batch_size, sizes[-1]), dtype=bool)
+        # Bias gradients are sums over the batch, ones.delta in BLAS is several times faster than np.sum
+        self.ones = np.ones(batch_size, dtype=self.dtype)
+        self.views = {}
+
+    def batch_views(self, b):
+        # The first b rows of the activation, delta and activation gradient buffers, sliced once per batch
+        # size (a fit has at most two) instead of on every step
+        if b not in self.views:
+            self.views[b] = ([a[:b] for a in self.activations], [d[:b] for d in self.delta],
+                             [g[:b] for g in self.grad_activations], self.y[:b], self.ones[:b])
+        return self.views[b]
+
+    def forward(self, b):
+        # Activations of the first b rows of the input buffer, the output in self.activations[-1][:b].
+        # Callers ignore overflow (np.errstate(over='ignore')) once around all their steps
+        activations = self.batch_views(b)[0]
+        last = len(self.weights) - 1
+        for layer, (w, bias) in enumerate(zip(self.weights, self.biases)):
+            z = activations[layer + 1]
+            np.dot(activations[layer], w.T, out=z)
+            z += bias
+            if layer < last:
+                np.tanh(z, out=z)
+            else:
+                # Sigmoid in place: 1 / (1 + exp(-z)), exp overflowing to inf gives 0 as it should
+                np.negative(z, out=z)
+                np.exp(z, out=z)
+                z += 1
+                np.reciprocal(z, out=z)
+        return activations[-1]
+
+    def backward(self, b, learning_rate):
+        # Gradients of the mean cross-entropy of the first b rows, already multiplied by the learning
+        # rate, into grad_weights and grad_biases
+        activations, deltas, grad_activations, y, ones = self.batch_views(b)
+        delta = deltas[-1]
+        # Sigmoid with cross-entropy: dL/dz = (a - y) / b
+        np.subtract(activations[-1], y, out=delta)
+        delta *= learning_rate / b
+        for layer in range(len(self.weights) - 1, -1, -1):
+            inputs = activations[layer]
+            np.dot(delta.T, inputs, out=self.grad_weights[layer])
+            np.dot(ones, delta, out=self.grad_biases[layer])
+            if layer == 0:
+                break
+            grad = grad_activations[layer - 1]
+            np.dot(delta, self.weights[layer], out=grad)
+            # tanh'(z) = 1 - a^2, computed in the next delta buffer
+            delta = deltas[layer - 1]
+            np.multiply(inputs, inputs, out=delta)
+            np.subtract(1, delta, out=delta)
+            delta *= grad
+
+    def update(self):
+        # The gradients are already scaled by the learning rate
+        for w, b, dw, db in zip(self.weights, self.biases, self.grad_weights, self.grad_biases):
+            w -= dw
+            b -= db
+
+    def batch_loss(self, b):
+        # Summed cross-entropy of the first b rows (after forward), the output delta buffer as scratch
+        return cross_entropy_sum(self.activations[-1][:b], self.y[:b], self.delta[-1][:b])
+
+    def batch_correct(self, b):
+        return count_correct(self.activations[-1][:b], self.y[:b], self.predicted[:b], self.truth[:b])
+
+    def evaluate(self, X, Y, batch_size=None):
+        # Mean cross-entropy and accuracy (in %) of the network on X (n_x, m), Y (n_y, m)
+        X = np.asarray(X)
+        Y = np.asarray(Y).reshape(self.layer_sizes[-1], -1)
+        m = X.shape[1]
+        batch_size = batch_size or max(self.batch_size, 1024)
+        self.allocate(min(batch_size, m))
+        loss = correct = 0.0
+        with np.errstate(over='ignore'):
+            for start in range(0, m, self.batch_size):
+                b = min(self.batch_size, m - start)
+                self.x[:b] = X[:, start:start + b].T
+                self.y[:b] = Y[:, start:start + b].T
+                self.forward(b)
+                loss += self.batch_loss(b)
+                correct += self.batch_correct(b)
+        return loss / m, float(correct) / (m * Y.shape[0]) * 100
+
+    def fit(self, X, Y, epochs=100, batch_size=None, learning_rate=1.2, validation=None, callbacks=(),
+            shuffle=True, verbose=False):
+        # Gradient descent over X (n_x, m), Y (n_y, m), on all the examples at once by default (as the
+        # notebook) or on mini-batches of batch_size examples reshuffled every epoch. Returns the
+        # history, one dict per epoch with the training loss and accuracy (and validation ones if given).
+        # Callbacks are called as callback(network, epoch, logs) after every epoch and stop the training
+        # by returning True
+        X = np.asarray(X)
+        Y = np.asarray(Y).reshape(self.layer_sizes[-1], -1)
+        m = X.shape[1]
+        batch_size = m if batch_size is None else min(batch_size, m)
+        self.allocate(batch_size)
+        # Examples as contiguous rows in the working dtype, so gathering a batch copies whole rows
+        rows_x = np.ascontiguousarray(X.T, dtype=self.dtype)
+        rows_y = np.ascontiguousarray(Y.T, dtype=self.dtype)
+        # With a single batch (full-batch gradient descent as in the notebook) the order does not matter,
+        # the examples are copied into the buffers once
+        full_batch = batch_size == m
+        if full_batch:
+            self.x[:m], self.y[:m] = rows_x, rows_y
+        # Output of every batch before its update, in the order of the epoch, and the matching labels, for
+        # the epoch's loss and accuracy computed once at its end rather than on every step
+        outputs = np.empty_like(rows_y)
+        labels = np.empty_like(rows_y) if shuffle and not full_batch else rows_y
+        scratch = np.empty_like(rows_y)
+        predicted, truth = np.empty(rows_y.shape, dtype=bool), np.empty(rows_y.shape, dtype=bool)
+        history = []
+        self.stop_training = False
+        for epoch in range(epochs):
+            shuffled = shuffle and not full_batch
+            order = self.rng.permutation(m) if shuffled else None
+            with np.errstate(over='ignore'):
+                for start in range(0, m, batch_size):
+                    b = min(batch_size, m - start)
+                    if shuffled:
+                        index = order[start:start + b]
+                        np.take(rows_x, index, axis=0, out=self.x[:b])
+                        np.take(rows_y, index, axis=0, out=self.y[:b])
+                    elif not full_batch:
+                        self.x[:b], self.y[:b] = rows_x[start:start + b], rows_y[start:start + b]
+                    outputs[start:start + b] = self.forward(b)
+                    self.backward(b, learning_rate)
+                    self.update()
+                if shuffled:
+                    np.take(rows_y, order, axis=0, out=labels)
+                loss = cross_entropy_sum(outputs, labels, scratch)
+            correct = count_correct(outputs, labels, predicted, truth)
+            logs = {'epoch': epoch, 'loss': loss / m, 'accuracy': float(correct) / (m * Y.shape[0]) * 100}
+            if validation is not None:
+                logs['val_loss'], logs['val_accuracy'] = self.evaluate(*validation)
+                if full_batch:
+                    self.x[:m], self.y[:m] = rows_x, rows_y
+            history.append(logs)
+            if verbose:
+                values = ['%s: %f' % (name, value) for name, value in logs.items() if name != 'epoch']
+                print('Epoch %d\t%s' % (epoch, '  '.join(values)))
+            for callback in callbacks:
+                if callback(self, epoch, logs):
+                    self.stop_training = True
+            if self.stop_training:
+                break
+        return history
+
+    def predict_proba(self, X):
+        # Output of the network for X (n_x, m), (n_y, m)
+        X = np.asarray(X)
+        m = X.shape[1]
+        self.allocate(min(max(self.batch_size, 1024), m))
+        out = np.empty((m, self.layer_sizes[-1]), dtype=self.dtype)
+        with np.errstate(over='ignore'):
+            for start in range(0, m, self.batch_size):
+                b = min(self.batch_size, m - start)
+                self.x[:b] = X[:, start:start + b].T
+                out[start:start + b] = self.forward(b)
+        return out.T
+
+    def predict(self, X):
+        return self.predict_proba(X) > 0.5
+
+    def parameters(self):
+        # Weights in the dictionary layout of the notebook: W1, b1 (column vector), W2, b2...
+        parameters = {}
+        for layer, (w, b) in enumerate(zip(self.weights, self.biases), 1):
+            parameters['W%d' % layer] = w.copy()
+            parameters['b%d' % layer] = b.reshape(-1, 1).copy()
+        return parameters
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights] + [b.copy() for b in self.biases]
+
+    def set_weights(self, weights):
+        # Copies into the existing arrays, which the work buffers were sized for
+        if len(weights) != 2 * len(self.weights):
+            raise ValueError("Expected %d arrays, the weights then the biases" % (2 * len(self.weights)))
+        for target, source in zip(self.weights + self.biases, weights):
+            target[...] = source
+
+
+class EarlyStopping:
+    # Callback stopping the training when the monitored value (the validation loss if there is one) has
+    # not improved by min_delta for patience epochs, and then restoring the weights of the best epoch
+
+    def __init__(self, monitor=None, patience=10, min_delta=0.0, restore_best=True):
+        self.monitor = monitor
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.best = np.inf
+        self.best_epoch = None
+        self.best_weights = None
+
+    def __call__(self, network, epoch, logs):
+        if epoch == 0:
+            # A new fit
+            self.best, self.best_epoch, self.best_weights = np.inf, None, None
+        monitor = self.monitor or ('val_loss' if 'val_loss' in logs else 'loss')
+        # Accuracies improve upwards, losses downwards
+        value = -logs[monitor] if 'accuracy' in monitor else logs[monitor]
+        if value < self.best - self.min_delta:
+            self.best = value
+            self.best_epoch = epoch
+            if self.restore_best:
+                self.best_weights = network.get_weights()
+            return False
+        # Counting from before the first epoch while no value has been an improvement (all NaN so far)
+        last = self.best_epoch if self.best_epoch is not None else -1
+        if epoch - last < self.patience:
+            return False
+        if self.restore_best and self.best_weights is not None:
+            network.set_weights(self.best_weights)
+        return True
@@ -0,0 +1,139 @@
+import numpy as np
+
+# The RNN of RNN from scratch.ipynb trained on mini-batches of sequences: every timestep of the forward
+# and backward passes is one matrix product over the whole batch instead of a Python loop over samples.
+# Same model as the notebook: a sigmoid hidden state s_t = sigmoid(W s_(t-1) + U[:, t] x_t) (U holds one
+# input weight column per timestep, the notebook's U @ new_input) and an output V s_T after the last step.
+#
+#     U, V, W, T, hidden_dim = rnn(X, Y, nepoch=100, learning_rate=0.03, T=30, hidden_dim=150, batch_size=8,
+#                                  bptt_truncate=5, init_scale=0.3, X_val=X_val, Y_val=Y_val)
+#     preds = rnn_pred(X_val, Y_val, U, V, W, T, hidden_dim)        # (n, output_dim, 1), as the notebook
+#
+# X is (n, T, 1) and Y (n, output_dim), the shapes built in the notebook. Without batch_size and init_scale,
+# training is the notebook's (one update per sequence, weights uniform in [0, 1]), so its
+# rnn(X, Y, nepoch=20, learning_rate=0.0003, T=30, hidden_dim=150, output_dim=1) call is unchanged. Batches
+# take fewer, averaged updates per epoch, which from [0, 1] weights is too few to bring down the large
+# initial outputs: use them with a small init_scale and a larger learning rate, as above.
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def rnn_forward(x, U, V, W, states=None):
+    # Hidden states of a batch of sequences x (batch, T), (T + 1, batch, hidden) with the zero initial
+    # state first, and the outputs (batch, output_dim). states is an optional buffer reused between batches
+    batch, T = x.shape
+    if states is None:
+        states = np.empty((T + 1, batch, W.shape[0]))
+    states[0] = 0
+    for t in range(T):
+        s = states[t + 1]
+        np.matmul(states[t], W.T, out=s)
+        s += x[:, t, np.newaxis] * U[:, t]
+        # sigmoid in place, exp overflowing to inf gives 0 as it should
+        np.negative(s, out=s)
+        with np.errstate(over='ignore'):
+            np.exp(s, out=s)
+        s += 1
+        np.reciprocal(s, out=s)
+    return states, states[T] @ V.T
+
+
+def rnn_backward(x, y, U, V, W, states, outputs, bptt_truncate=None):
+    # Gradients of the mean squared error (y - output)^2 / 2 of the batch with respect to U, V and W.
+    # The error only enters at the last step, and flows back through at most bptt_truncate timesteps
+    # (all of them if None)
+    batch, T = x.shape
+    d_output = (outputs - y) / batch
+    dV = d_output.T @ states[T]
+    dU = np.zeros_like(U)
+    dW = np.zeros_like(W)
+    ds = d_output @ V
+    first = 0 if bptt_truncate is None else max(0, T - bptt_truncate)
+    for t in range(T - 1, first - 1, -1):
+        s = states[t + 1]
+        d_add = ds * s * (1 - s)
+        dW += d_add.T @ states[t]
+        dU[:, t] = d_add.T @ x[:, t]
+        ds = d_add @ W
+    return dU, dV, dW
+
+
+def clip_gradients(gradients, clip_value=None, clip_norm=None):
+    # Clips every gradient element to [-clip_value, clip_value] (as the notebook), then rescales the
+    # gradients together so their global L2 norm is at most clip_norm
+    if clip_value is not None:
+        for gradient in gradients:
+            np.clip(gradient, -clip_value, clip_value, out=gradient)
+    if clip_norm is not None:
+        norm = np.sqrt(sum(np.sum(gradient ** 2) for gradient in gradients))
+        if norm > clip_norm:
+            for gradient in gradients:
+                gradient *= clip_norm / norm
+    return gradients
+
+
+def rnn_loss(X, Y, U, V, W, batch_size=256):
+    # Mean of (y - prediction)^2 / 2 over the sequences. The notebook prints the sum (it divides by
+    # y.shape[0], which is 1), len(X) times this
+    total = 0.0
+    for start in range(0, len(X), batch_size):
+        x = X[start:start + batch_size].reshape(-1, U.shape[1])
+        _, outputs = rnn_forward(x, U, V, W)
+        total += np.sum((Y[start:start + batch_size].reshape(outputs.shape) - outputs) ** 2) / 2
+    return total / len(X)
+
+
+def rnn(X, Y, nepoch=25, learning_rate=0.0001, T=50, hidden_dim=100, output_dim=1, batch_size=1,
+        bptt_truncate=5, clip_value=10, clip_norm=None, init_scale=None, X_val=None, Y_val=None,
+        verbose=True, random_state=None):
+    # Gradient descent on batches of batch_size sequences (one at a time by default, as the notebook) with
+    # truncated backpropagation through time. Returns U, V, W, T and
+    # hidden_dim like the notebook's rnn(). Weights start uniform in [0, 1] as in the notebook, or in
+    # [-init_scale, init_scale] if given (with many hidden units, [0, 1] saturates the sigmoids)
+    if (X_val is None) != (Y_val is None):
+        raise ValueError("X_val and Y_val must be given together")
+    rng = np.random.RandomState(random_state)
+    low, high = (0, 1) if init_scale is None else (-init_scale, init_scale)
+    U = rng.uniform(low, high, (hidden_dim, T))
+    W = rng.uniform(low, high, (hidden_dim, hidden_dim))
+    V = rng.uniform(low, high, (output_dim, hidden_dim))
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), T)
+    Y = np.asarray(Y, dtype=np.float64).reshape(len(Y), output_dim)
+    batch_size = min(batch_size, len(X))
+    # Hidden states of a batch, reused by every batch of the training
+    states = np.empty((T + 1, batch_size, hidden_dim))
+
+    for epoch in range(nepoch):
+        if verbose:
+            loss = rnn_loss(X, Y, U, V, W)
+            message = 'Epoch: %d, Loss: %f' % (epoch + 1, loss)
+            if X_val is not None:
+                message += ', Val Loss: %f' % rnn_loss(X_val, Y_val, U, V, W)
+            print(message)
+        order = rng.permutation(len(X))
+        for start in range(0, len(X), batch_size):
+            index = order[start:start + batch_size]
+            x, y = X[index], Y[index]
+            batch_states, outputs = rnn_forward(x, U, V, W, states[:, :len(index)])
+            dU, dV, dW = rnn_backward(x, y, U, V, W, batch_states, outputs, bptt_truncate)
+            clip_gradients((dU, dV, dW), clip_value, clip_norm)
+            U -= learning_rate * dU
+            V -= learning_rate * dV
+            W -= learning_rate * dW
+    return U, V, W, T, hidden_dim
+
+
+def rnn_pred(X, Y, U, V, W, T, hidden_dim, batch_size=256):
+    # Predictions for all the sequences of X, batch_size at a time, as a (n, output_dim, 1) array like the
+    # notebook's. Y is unused, kept for the notebook's signature. Inputs are fed as in training (one
+    # timestep at a time), where the notebook's rnn_pred fed the whole sequence at every timestep
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), T)
+    preds = np.empty((len(X), V.shape[0], 1))
+    states = np.empty((T + 1, min(batch_size, len(X)), hidden_dim))
+    for start in range(0, len(X), batch_size):
+        x = X[start:start + batch_size]
+        _, outputs = rnn_forward(x, U, V, W, states[:, :len(x)])
+        preds[start:start + len(x), :, 0] = outputs
+    return preds
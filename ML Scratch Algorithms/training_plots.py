@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import queue
+import re
+
+import numpy as np
+
+# Training visualisations of Artificial Neural Network.ipynb (decision boundary, loss and accuracy,
+# saved under scratch_mlp/plots and stitched into GIFs) rendered by a background process, so training
+# only copies the current parameters into a bounded queue. Frames are taken every N iterations or at
+# logarithmically spaced iterations, and every frame is appended to the GIFs as soon as it is drawn
+# instead of reading all the PNGs back at the end:
+#
+#     with TrainingPlotter(X, y, schedule=FrameSchedule(every=1000)) as plotter:
+#         for i in range(num_iterations):
+#             ...
+#             plotter.step(i, parameters, cost)
+#
+#     # or as a NeuralNetwork callback, one frame per epoch at logarithmic spacing
+#     with TrainingPlotter(X, y, schedule=FrameSchedule(per_decade=10)) as plotter:
+#         network.fit(X, y, epochs=1000, callbacks=[plotter])
+
+PLOTS = ('accuracy', 'boundary', 'loss')
+
+
+class FrameSchedule:
+    # Which iterations get a frame: every `every` iterations, or per_decade frames for each power of 10
+    # (iterations 0, 1, 2, 3, 4, 6, 8, 11, 14, 18... for 10 per decade), which shows the fast early changes
+    # of training without thousands of nearly identical late frames
+
+    def __init__(self, every=None, per_decade=None):
+        if (every is None) == (per_decade is None):
+            raise ValueError("Give exactly one of every and per_decade")
+        if (every is not None and every < 1) or (per_decade is not None and per_decade <= 0):
+            raise ValueError("every and per_decade must be positive")
+        self.every = every
+        self.ratio = 10 ** (1 / per_decade) if per_decade else None
+        self.next = 0
+
+    def __call__(self, iteration):
+        if self.every is not None:
+            return iteration % self.every == 0
+        if iteration < self.next:
+            return False
+        # The next frame iteration is at least one further, so the start is not every iteration
+        self.next = max(iteration + 1, int(np.ceil(iteration * self.ratio)))
+        return True
+
+
+def forward(parameters, X):
+    # Output of the notebook network for X (n_x, m): tanh hidden layers and sigmoid output, with
+    # parameters W1, b1, W2, b2... (nn_model's dictionary or NeuralNetwork.parameters())
+    n_layers = len(parameters) // 2
+    A = X
+    for layer in range(1, n_layers + 1):
+        Z = np.dot(parameters['W%d' % layer], A) + parameters['b%d' % layer]
+        A = np.tanh(Z) if layer < n_layers else 1 / (1 + np.exp(-Z))
+    return A
+
+
+def figure_frame(fig):
+    # The drawn figure as an RGB array, for the GIF writers
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())[:, :, :3].copy()
+
+
+class FrameRenderer:
+    # Everything drawn in the background process: one figure per plot, cleared and redrawn for every frame
+    # (creating figures is a large part of the cost of the notebook's plots), and one open GIF writer each
+
+    def __init__(self, X, y, directory, duration=0.25, resolution=200, save_png=True):
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import imageio
+        self.plt = plt
+        self.X = X
+        self.y = np.ravel(y)
+        self.directory = directory
+        self.save_png = save_png
+        # Decision boundary grid: resolution points along each axis instead of the notebook's 0.01 steps,
+        # which over a 20 x 25 range is 5M network evaluations per frame
+        x_min, x_max = X[0].min() - 1, X[0].max() + 1
+        y_min, y_max = X[1].min() - 1, X[1].max() + 1
+        self.xx, self.yy = np.meshgrid(np.linspace(x_min, x_max, resolution),
+                                       np.linspace(y_min, y_max, resolution))
+        self.grid = np.vstack([self.xx.ravel(), self.yy.ravel()])
+        self.text_position = (x_min, y_max + 0.2)
+        self.losses = []
+        self.accuracies = []
+        self.figures = {name: plt.figure() for name in PLOTS}
+        self.all_figure = plt.figure(figsize=(20, 5))
+        for name in PLOTS + ('all', 'gif'):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+        self.writers = {name: imageio.get_writer(os.path.join(directory, 'gif', name + '.gif'), mode='I',
+                                                 duration=duration) for name in PLOTS + ('all',)}
+
+    def draw_curve(self, fig, points, ylabel, title):
+        fig.clf()
+        ax = fig.add_subplot(111)
+        if points:
+            t, values = zip(*points)
+            ax.plot(t, values, 'b')
+        ax.set_xlabel('Batch #')
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+
+    def draw_boundary(self, fig, parameters, text):
+        fig.clf()
+        ax = fig.add_subplot(111)
+        Z = (forward(parameters, self.grid) > 0.5).reshape(self.xx.shape)
+        ax.contourf(self.xx, self.yy, Z, cmap=self.plt.cm.Spectral)
+        ax.scatter(self.X[0], self.X[1], c=self.y, cmap=self.plt.cm.Spectral)
+        ax.set_xlabel('x1')
+        ax.set_ylabel('x2')
+        ax.text(*self.text_position, text, fontsize=14)
+
+    def render(self, iteration, parameters, losses, accuracy):
+        # One frame: losses are the loss points recorded since the previous frame
+        self.losses.extend(losses)
+        if accuracy is None:
+            accuracy = np.mean((forward(parameters, self.X) > 0.5).ravel() == (self.y > 0.5)) * 100
+        self.accuracies.append((iteration, accuracy))
+        loss = self.losses[-1][1] if self.losses else float('nan')
+        text = 'Batch #: %d    Accuracy: %.2f    Loss value: %.2f' % (iteration, accuracy, loss)
+        self.draw_boundary(self.figures['boundary'], parameters, text)
+        self.draw_curve(self.figures['loss'], self.losses, 'Loss', 'Loss estimation')
+        self.draw_curve(self.figures['accuracy'], self.accuracies, 'Accuracy', 'Accuracy estimation')
+        frames = {}
+        for name in PLOTS:
+            frames[name] = figure_frame(self.figures[name])
+            if self.save_png:
+                self.figures[name].savefig(os.path.join(self.directory, name, 'image_%d.png' % iteration))
+            self.writers[name].append_data(frames[name])
+
+        # The combined frame of make_all_gif, drawn from the three frames just rendered
+        fig = self.all_figure
+        fig.clf()
+        for position, name in enumerate(PLOTS):
+            ax = fig.add_subplot(1, 3, position + 1)
+            ax.imshow(frames[name], interpolation='none')
+            ax.set_axis_off()
+        fig.suptitle('Step = %d' % iteration, fontsize=18)
+        fig.tight_layout()
+        if self.save_png:
+            fig.savefig(os.path.join(self.directory, 'all', 'image_%d.png' % iteration))
+        self.writers['all'].append_data(figure_frame(fig))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.plt.close('all')
+
+
+def render_frames(frames, X, y, directory, duration, resolution, save_png):
+    # Body of the background process: renders frames from the queue until None
+    renderer = FrameRenderer(X, y, directory, duration, resolution, save_png)
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            renderer.render(*frame)
+    finally:
+        renderer.close()
+
+
+class TrainingPlotter:
+    # Records the loss of every iteration and sends a frame (a copy of the parameters, the new loss points
+    # and the accuracy if known) to the background process at the iterations of the schedule.
+    # The queue holds at most max_queue frames. When it is full, step waits for the renderer if block is
+    # True. Otherwise training goes on and the frame is sent at the first step where the queue has room,
+    # with the parameters of that step, so a slow renderer gets fewer frames but always the latest state
+
+    def __init__(self, X, y, directory='./scratch_mlp/plots', schedule=None, max_queue=4, block=False,
+                 duration=0.25, resolution=200, save_png=True):
+        self.schedule = schedule or FrameSchedule(every=1000)
+        self.block = block
+        self.pending = []
+        self.late = False
+        self.skipped = 0
+        self.last = None
+        self.frames = multiprocessing.Queue(max_queue)
+        self.process = multiprocessing.Process(
+            target=render_frames, args=(self.frames, np.asarray(X), np.asarray(y), directory, duration,
+                                        resolution, save_png), daemon=True)
+        self.process.start()
+
+    def send(self, block):
+        if not block and self.frames.full():
+            self.late = True
+            return
+        iteration, parameters, accuracy = self.last
+        if callable(parameters):
+            parameters = parameters()
+        parameters = {name: np.array(value) for name, value in parameters.items()}
+        try:
+            self.frames.put((iteration, parameters, self.pending, accuracy), block=block)
+        except queue.Full:
+            self.late = True
+            return
+        self.late = False
+        self.pending = []
+
+    def step(self, iteration, parameters, loss, accuracy=None):
+        # parameters: the W1, b1... dictionary, or a function returning it, only called for frames
+        self.pending.append((iteration, float(loss)))
+        self.last = (iteration, parameters, accuracy)
+        scheduled = self.schedule(iteration)
+        if scheduled and self.late:
+            # The frame still waiting for room is replaced by this one
+            self.skipped += 1
+        if scheduled or self.late:
+            self.send(self.block)
+
+    def __call__(self, network, epoch, logs):
+        # NeuralNetwork callback: one step per epoch, never stops the training
+        self.step(epoch, network.parameters, logs['loss'], logs.get('accuracy'))
+        return False
+
+    def close(self):
+        # Sends the final state if it has no frame yet, then waits for the frames to be drawn and the
+        # GIFs to be written
+        if self.process.is_alive():
+            if self.pending:
+                self.send(True)
+            self.frames.put(None)
+        self.process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def frame_number(path):
+    # Iteration of image_<n>.png, to order frames by iteration rather than by modification time
+    match = re.search(r'(\d+)\.png$', path)
+    return int(match.group(1)) if match else -1
+
+
+def make_gif(input_folder, save_filepath, time_per_step=0.25):
+    # GIF of the PNGs of a folder in iteration order, read and written one frame at a time
+    import imageio
+    file_paths = sorted((os.path.join(input_folder, name) for name in os.listdir(input_folder)
+                         if name.endswith('.png')), key=frame_number)
+    with imageio.get_writer(save_filepath, mode='I', duration=time_per_step) as writer:
+        for file_path in file_paths:
+            writer.append_data(imageio.imread(file_path))
+
+
+def make_all_gif(input_folder, save_filepath, time_per_step=0.25):
+    # GIF of the combined frames in input_folder/all, as drawn by TrainingPlotter
+    make_gif(os.path.join(input_folder, 'all'), save_filepath, time_per_step)